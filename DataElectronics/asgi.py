@@ -3,14 +3,37 @@ ASGI config for DataElectronics project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The Procfile serves the WSGI application with gunicorn's sync workers, one
+request at a time per worker. To serve this one instead, with the read only
+pages running as async views (see pos/concurrency.py):
+
+    gunicorn DataElectronics.asgi:application -k uvicorn.workers.UvicornWorker --workers 3
+
+or, for a single process during development:
+
+    uvicorn DataElectronics.asgi:application --reload
+
+Every thread of the pool holds its own database connection, so allow for
+workers x threads connections, and one more for each export or bill PDF
+being streamed: streamed responses are read on a thread of their own, as
+Django 3.1 would iterate them on the event loop, where the exports' queries
+are refused (StreamingASGIHandler in pos/concurrency.py). Serve this module's
+`application`, not django.core.asgi.get_asgi_application(). `python manage.py benchmark_asgi` compares the
+throughput of both handlers on the current database.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
 """
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+
+from pos.concurrency import StreamingASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DataElectronics.settings')
 
-application = get_asgi_application()
+# what get_asgi_application() does, with django's handler swapped for one that reads streamed responses
+# (the exports) off the event loop
+django.setup(set_prefix=False)
+application = StreamingASGIHandler()
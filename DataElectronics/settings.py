@@ -14,6 +14,8 @@ from pathlib import Path
 import os
 import django_heroku
 
+from pos.database import database_config
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -25,7 +27,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = '8vhtoh!6ef$)1l#_8xg=ehuvqudwbvs4ay682eg_&5!v186rf&'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DJANGO_DEBUG', 'true').lower() in ('1', 'true', 'yes')      # the Procfile turns it off
 
 ALLOWED_HOSTS = []
 
@@ -46,8 +48,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'pos.middleware.RequestMetricsMiddleware',                  # first, so its timings cover the whole chain
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'pos.middleware.ReplicaMiddleware',                         # below the sessions, so saving one does not pin it
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -61,13 +65,23 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR,'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'pos.context_processors.fragments',
+            ],
+            # compiled templates are kept for the life of the process, unless templates are being edited
+            'loaders': [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ] if DEBUG else [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
             ],
         },
     },
@@ -78,15 +92,118 @@ WSGI_APPLICATION = 'DataElectronics.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
+# DATABASE_URL when set (Postgres, persistent or pooled connections), SQLite in WAL mode otherwise; see pos/database.py
 
 DATABASES = {
+    'default': database_config(sqlite_path=BASE_DIR / 'db.sqlite3'),
+}
+if os.environ.get('DATABASE_REPLICA_URL'):
+    DATABASES['replica'] = dict(database_config(url_variable='DATABASE_REPLICA_URL'), TEST={'MIRROR': 'default'})
+DATABASE_ROUTERS = ['pos.routers.ReplicaRouter']
+
+POS_DB_HEALTH_CHECKS = True                     # test a kept connection at the start of each request, replace it if the server dropped it
+POS_DB_REPLICA = 'replica'                      # alias the read-only views read from, when DATABASES has it; see pos/routers.py
+POS_REPLICA_PIN_SECONDS = 10                    # seconds a session that wrote keeps reading the primary, longer than the replica's lag
+POS_REPLICA_VIEWS = (                           # url names of the views served from the replica
+    'dashboard', 'sales-report', 'inventory', 'stock-search', 'suppliers-list', 'supplier', 'purchases-list', 'purchase-bill',
+    'sales-list', 'sale-bill', 'employees-list', 'employee', 'attendance-summary',
+    'export-stock', 'export-purchases', 'export-sales', 'export-attendance',
+)
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# local memory is per process; with several gunicorn workers point this at a shared
+# backend (e.g. 'django.core.cache.backends.filebased.FileBasedCache' or
+# 'django.core.cache.backends.db.DatabaseCache') so invalidation reaches every worker
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'dataelectronics',
     }
 }
 
 
+# Dashboard
+
+POS_DASHBOARD_CACHE = 'default'                 # cache alias holding the dashboard figures
+POS_DASHBOARD_CACHE_TIMEOUT = 300               # seconds, upper bound on staleness if an invalidation is missed
+POS_DASHBOARD_TOP_STOCKS = 20                   # number of stocks plotted on the dashboard chart
+
+
+# Stock search
+
+POS_STOCK_SEARCH_CANDIDATES = 500               # newest matches a sqlite search ranks and lists, all of them for a narrower term
+POS_STOCK_LOOKUP_PAGE_SIZE = 20                 # stocks per page of the json stock lookup
+POS_STOCK_LOOKUP_CACHE_TIMEOUT = 300            # seconds a lookup page stays cached server side
+POS_STOCK_CHECKPOINT_LAG = 60                   # seconds checkpoints trail the clock, longer than any posting transaction
+
+
+# Exports
+
+POS_EXPORT_CHUNK_SIZE = 2000                    # rows fetched (and items prefetched) per round trip while streaming an export
+
+
+# Imports
+
+POS_IMPORT_BATCH_SIZE = 2000                    # csv rows validated and upserted per transaction
+
+
+# Conditional GET of the bill and list pages (versions.versioned)
+
+POS_RESPONSE_CACHE_TIMEOUT = 0                  # seconds a rendered page is also kept in the cache per session and data version, 0 to only answer 304s
+POS_FRAGMENT_CACHE_TIMEOUT = 86400             # seconds the {% cache %} fragments of the templates (menus, bill items) are kept; their keys carry the versions
+
+
+# Bill posting api (pos/api.py)
+
+POS_API_TOKEN = os.environ.get('POS_API_TOKEN')                                     # "Authorization: Bearer <token>" of the api clients, the api is off without it
+POS_API_MAX_BILLS = 1000                        # bills one request may post
+POS_API_KEY_DAYS = 7                            # days the answer to a request with an Idempotency-Key is kept for its retries
+
+
+# Printed bills
+
+POS_BILL_PDF_DIR = os.path.join(BASE_DIR, 'bills')                      # rendered bill pdfs, one file per printed version of a bill
+POS_BILL_PDF_CACHE_TIMEOUT = 86400              # seconds the current pdf of a bill is remembered without checking the bill
+POS_BILL_PDF_FONTS = None                       # (regular, bold) .ttf files embedded for names beyond cp1252, e.g. DejaVu Sans; None prints in Helvetica
+
+
+# Background jobs, run by `manage.py runworker`
+
+POS_JOB_QUEUES = {                              # queue: jobs of it one worker runs at once
+    'default'   : 1,
+    'exports'   : 1,
+    'pdf'       : 2,
+    'images'    : 2,
+}
+POS_JOB_TIMEOUT = 600                           # seconds a claimed job stays invisible to other workers, unless the task sets its own
+POS_JOB_RETRY_DELAY = 30                        # seconds before the first retry of a failed job, doubled for each further attempt
+POS_JOB_POLL_INTERVAL = 1                       # seconds an idle worker waits before looking for due jobs again
+POS_JOB_KEEP_DAYS = 7                           # finished jobs, and the files they produced, are deleted after this
+POS_EXPORT_DIR = os.path.join(BASE_DIR, 'exports')                      # files of the background exports
+
+
+# Profile photos
+
+POS_THUMBNAIL_SIZES = (48, 96, 150, 300)        # widths in pixels of the square thumbnails made of every supplier and employee photo
+
+
+# Reports
+
+POS_REPORT_DEFAULT_DAYS = 30                    # days shown when the report is opened without a range
+POS_REPORT_MAX_DAYS = 3660                      # longest range one report may ask for
+POS_REPORT_TOP_STOCKS = 10                      # best selling stocks listed on the report
+
+
+# Request metrics
+
+POS_METRICS_SAMPLE_RATE = float(os.environ.get('POS_METRICS_SAMPLE_RATE', 0.1))     # fraction of requests measured, 0 turns it off
+POS_METRICS_DUPLICATE_THRESHOLD = 3             # one statement repeated this often in a request is reported as N+1
+POS_METRICS_TOKEN = os.environ.get('POS_METRICS_TOKEN')                             # /metrics is served only when set, to "Authorization: Bearer <token>"
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -125,6 +242,23 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
+STATICFILES_FINDERS = [
+    'django.contrib.staticfiles.finders.FileSystemFinder',
+    'pos.assets.ReferencedAppDirectoriesFinder',            # only what the templates load, see pos/assets.py
+    'pos.assets.BundleFinder',
+]
+WHITENOISE_KEEP_ONLY_HASHED_FILES = True        # pages only ask for the fingerprinted names, the copies under the original names are dropped
+
+POS_STATIC_BUILD_DIR = os.path.join(BASE_DIR, 'build', 'static')        # where the bundles are concatenated before collectstatic takes them
+POS_STATIC_BUNDLES = {                          # bundle: its sources, in order
+    'dist/base.css'     : ['assets/plugins/bootstrap/css/bootstrap.min.css', 'assets/css/style.min.css'],
+    'dist/base.js'      : ['assets/bundles/libscripts.bundle.js', 'assets/bundles/vendorscripts.bundle.js', 'assets/bundles/mainscripts.bundle.js'],
+    'dist/dashboard.css': ['assets/plugins/jvectormap/jquery-jvectormap-2.0.3.min.css', 'assets/plugins/charts-c3/plugin.css'],
+    'dist/dashboard.js' : ['assets/bundles/jvectormap.bundle.js', 'assets/bundles/c3.bundle.js', 'assets/js/pages/index.js'],
+}
 
 # Activate Django-Heroku.
-django_heroku.settings(locals())
+django_heroku.settings(locals(), databases=False)                      # DATABASES is configured above
+
+# the WhiteNoise middleware django_heroku adds is sync only, which serialises the middleware chain under ASGI
+MIDDLEWARE = ['pos.middleware.StaticFilesMiddleware' if name == 'whitenoise.middleware.WhiteNoiseMiddleware' else name for name in MIDDLEWARE]
@@ -16,54 +16,71 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 from pos import views
+from pos.concurrency import async_view
 from django.conf.urls.static import static
 from django.conf import settings
 
 urlpatterns = [
     path('admin/', admin.site.urls),
 
-    #pos urls
+    #pos urls, the read only pages are async_view: under ASGI they run on the thread pool (pos/concurrency.py)
     path('', views.login, name='login'),
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('metrics', views.metrics, name='metrics'),
+    path('reports/', views.sales_report, name='sales-report'),
+    path('api/sales', views.api_sales, name='api-sales'),
+    path('api/purchases', views.api_purchases, name='api-purchases'),
+    path('jobs/<int:pk>', views.job_status, name='job'),
+    path('jobs/<int:pk>/file', views.job_file, name='job-file'),
+    path('thumbs/<str:name>', views.thumbnail, name='thumbnail'),                  # ahead of the media files below, which share MEDIA_URL
 
     #inventory
-    path('inventory/', views.StockListView.as_view(), name='inventory'),
+    path('inventory/', async_view(views.StockListView.as_view()), name='inventory'),
     path('new/', views.StockCreateView.as_view(), name='new-stock'),
+    path('inventory/search', views.stock_search, name='stock-search'),
+    path('inventory/export', views.export_stock, name='export-stock'),
+    path('inventory/import', views.StockImportView.as_view(), name='import-stock'),
     path('stock/<pk>/edit', views.StockUpdateView.as_view(), name='edit-stock'),
     path('stock/<pk>/delete', views.StockDeleteView.as_view(), name='delete-stock'),
 
     #Purchase
-    path('purchases/', views.PurchaseView.as_view(), name='purchases-list'),
+    path('purchases/', async_view(views.PurchaseView.as_view()), name='purchases-list'),
+    path('purchases/export', views.export_purchases, name='export-purchases'),
     path('purchases/new', views.SelectSupplierView.as_view(), name='select-supplier'),
     path('purchases/new/<pk>', views.PurchaseCreateView.as_view(), name='new-purchase'),
     path('purchases/<pk>/delete', views.PurchaseDeleteView.as_view(), name='delete-purchase'),
-    path("purchases/<billno>", views.PurchaseBillView.as_view(), name="purchase-bill"),
+    path('purchases/<int:billno>/pdf', views.purchase_bill_pdf, name='purchase-bill-pdf'),
+    path("purchases/<billno>", async_view(views.PurchaseBillView.as_view()), name="purchase-bill"),
 
 
     #Supplier
     path('suppliers/new', views.SupplierCreateView.as_view(), name='new-supplier'),
-    path('suppliers/', views.SupplierListView.as_view(), name='suppliers-list'),
+    path('suppliers/', async_view(views.SupplierListView.as_view()), name='suppliers-list'),
     path('suppliers/<pk>/edit', views.SupplierUpdateView.as_view(), name='edit-supplier'),
     path('suppliers/<pk>/delete', views.SupplierDeleteView.as_view(), name='delete-supplier'),
-    path('suppliers/<name>', views.SupplierView.as_view(), name='supplier'),
+    path('suppliers/<name>', async_view(views.SupplierView.as_view()), name='supplier'),
 
 
     #SaleBill
-    path('sales/', views.SaleView.as_view(), name='sales-list'),
+    path('sales/', async_view(views.SaleView.as_view()), name='sales-list'),
+    path('sales/export', views.export_sales, name='export-sales'),
     path('sales/new', views.SaleCreateView.as_view(), name='new-sale'),
     path('sales/<pk>/delete', views.SaleDeleteView.as_view(), name='delete-sale'),
-    path("sales/<billno>", views.SaleBillView.as_view(), name="sale-bill"),
+    path('sales/<int:billno>/pdf', views.sale_bill_pdf, name='sale-bill-pdf'),
+    path("sales/<billno>", async_view(views.SaleBillView.as_view()), name="sale-bill"),
 
     #Employee
     path('employee/new', views.EmployeeCreateView.as_view(), name='new-employee'),
-    path('employees/', views.EmployeeListView.as_view(), name='employees-list'),
+    path('employees/', async_view(views.EmployeeListView.as_view()), name='employees-list'),
     path('employees/<pk>/edit', views.EmployeeUpdateView.as_view(), name='edit-employee'),
     path('employees/<pk>/delete', views.EmployeeDeleteView.as_view(), name='delete-employee'),
-    path('employee/<name>', views.EmployeerView.as_view(), name='employee'),
+    path('employee/<name>', async_view(views.EmployeerView.as_view()), name='employee'),
 
 
     #Payroll
     path('attendence/today', views.AttendenceMarkView, name='today-attendence'),
+    path('attendence/export', views.export_attendance, name='export-attendance'),
+    path('attendence/summary', views.attendance_summary, name='attendance-summary'),
 
 
 ]+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,182 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator, RegexValidator
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .forms import PurchaseItemForm, SaleForm, SaleItemForm, SelectSupplierForm
+from .models import IdempotencyKey, Stock, Supplier
+from .services import InsufficientStock, post_purchases, post_sales
+
+
+# the json api the barcode terminals and the web shop sync post bills to, instead of the html formsets. A
+# request carries one bill, or {"bills": [...]} of up to POS_API_MAX_BILLS; the bills are checked with the
+# rules of the html forms and posted together, in one transaction, by the bulk services:
+#
+#   POST /api/sales      {"name": ..., "phone": ..., "address": ..., "email": ..., "nic": ...,
+#                         "items": [{"stock": 1, "quantity": 2, "perprice": 450}, ...]}
+#   POST /api/purchases  {"supplier": 3, "items": [...]}
+#
+# and answers 201 {"bills": [billno, ...]}, in the order sent. With an Idempotency-Key header the answer is
+# kept for POS_API_KEY_DAYS, and the same key sent again gets it back without anything being posted twice.
+
+
+class ApiError(Exception):
+    def __init__(self, status, body):
+        self.status = status
+        self.body = body
+        super().__init__(body)
+
+
+# the fields of a form, as its __init__ sets them up, cleaning one bill or line at a time. A form instance a
+# line spent most of a batch's time copying its fields and building querysets, and its ModelChoiceField and
+# model validation cost two queries a line; the stocks and suppliers of a batch are fetched once instead.
+# The forms have no clean methods to miss. What the html forms leave to the browser (the widgets' min and
+# pattern) is checked here, there is no browser in front of the api
+class Rules:
+    def __init__(self, form_class, preloaded=()):
+        self.model = form_class._meta.model
+        self.fields = form_class().fields
+        self.preloaded = preloaded                                              # the foreign keys, looked up in `objects`
+        for field in self.fields.values():
+            if 'min' in field.widget.attrs:
+                field.validators.append(MinValueValidator(int(field.widget.attrs['min'])))
+            if 'pattern' in field.widget.attrs:
+                field.validators.append(RegexValidator('^(?:%s)$' % field.widget.attrs['pattern'], field.widget.attrs.get('title')))
+
+    def clean(self, data, objects):
+        cleaned, errors = {}, {}
+        for name, field in self.fields.items():
+            value = data.get(name)
+            try:
+                cleaned[name] = self._lookup(field, objects[name], value) if name in self.preloaded else field.clean(value)
+            except ValidationError as error:
+                errors[name] = error.messages
+        return cleaned, errors
+
+    def _lookup(self, field, rows, value):
+        if value in field.empty_values:
+            raise ValidationError(field.error_messages['required'])
+        try:
+            return rows[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError(field.error_messages['invalid_choice'])
+
+
+def _bills(data):
+    bills = data.get('bills') if isinstance(data, dict) and 'bills' in data else [data]
+    if not isinstance(bills, list) or not bills or not all(isinstance(bill, dict) for bill in bills):
+        raise ApiError(400, {'error': 'Send a bill, or {"bills": [...]} with at least one.'})
+    if len(bills) > settings.POS_API_MAX_BILLS:
+        raise ApiError(400, {'error': 'At most %d bills a request.' % settings.POS_API_MAX_BILLS})
+    return bills
+
+
+def _lines(bills):
+    return [line for bill in bills if isinstance(bill.get('items'), list) for line in bill['items'] if isinstance(line, dict)]
+
+
+def _ids(values):
+    return {int(value) for value in values if isinstance(value, int) or (isinstance(value, str) and value.isdigit())}
+
+
+def _live(model, ids):
+    return {obj.pk: obj for obj in model.objects.filter(pk__in=ids, is_deleted=False)}
+
+
+# (bill, items) pairs of unsaved instances, or ApiError with the errors of each bill that has any, by its index
+def _postings(bills, bill_rules, item_rules, objects):
+    postings, errors = [], {}
+    for index, data in enumerate(bills):
+        bill, bill_errors = bill_rules.clean(data, objects)
+        lines = data.get('items')
+        if not isinstance(lines, list) or not lines or not all(isinstance(line, dict) for line in lines):
+            bill_errors['items'] = ['A bill needs a list of at least one item.']
+            lines = []
+        items, item_errors = [], {}
+        for number, line in enumerate(lines):
+            item, line_errors = item_rules.clean(line, objects)
+            items.append(item)
+            if line_errors:
+                item_errors[number] = line_errors
+        if item_errors:
+            bill_errors['items'] = item_errors
+        if bill_errors:
+            errors[index] = bill_errors
+        elif not errors:
+            postings.append((bill_rules.model(**bill), [item_rules.model(**item) for item in items]))
+    if errors:
+        raise ApiError(400, {'errors': errors})
+    return postings
+
+
+def sale_postings(bills):
+    objects = {'stock': _live(Stock, _ids(line.get('stock') for line in _lines(bills)))}
+    return _postings(bills, Rules(SaleForm), Rules(SaleItemForm, ['stock']), objects)
+
+
+def purchase_postings(bills):
+    objects = {
+        'stock'     : _live(Stock, _ids(line.get('stock') for line in _lines(bills))),
+        'supplier'  : _live(Supplier, _ids(bill.get('supplier') for bill in bills)),
+    }
+    return _postings(bills, Rules(SelectSupplierForm, ['supplier']), Rules(PurchaseItemForm, ['stock']), objects)
+
+
+ENDPOINTS = {
+    'sales'     : (sale_postings, post_sales),
+    'purchases' : (purchase_postings, post_purchases),
+}
+
+
+def _replay(endpoint, key, fingerprint):
+    kept = IdempotencyKey.objects.filter(endpoint=endpoint, key=key).first()
+    if kept is None:
+        return None
+    if kept.fingerprint != fingerprint:
+        raise ApiError(422, {'error': 'This Idempotency-Key was sent with another request.'})
+    if not kept.response:                                                       # its request has not finished
+        raise ApiError(409, {'error': 'A request with this Idempotency-Key is being posted.'})
+    return json.loads(kept.response)
+
+
+# posts the bills of a request body to the endpoint; returns (the answer, whether it is a replay of a key's)
+def submit(endpoint, body, key=None):
+    if key is not None and not 0 < len(key) <= 255:
+        raise ApiError(400, {'error': 'An Idempotency-Key is 1 to 255 characters.'})
+    fingerprint = hashlib.sha256(body).hexdigest()
+    if key is not None:
+        answer = _replay(endpoint, key, fingerprint)
+        if answer is not None:
+            return answer, True
+    try:
+        data = json.loads(body)
+    except ValueError:
+        raise ApiError(400, {'error': 'The body is not valid JSON.'})
+    parse, post = ENDPOINTS[endpoint]
+    postings = parse(_bills(data))
+    try:
+        with transaction.atomic():
+            # taken first, so a retry racing the original waits on the key's unique index instead of posting too
+            kept = IdempotencyKey.objects.create(endpoint=endpoint, key=key, fingerprint=fingerprint) if key is not None else None
+            answer = {'bills': [bill.billno for bill in post(postings)]}
+            if kept is not None:
+                kept.response = json.dumps(answer)
+                kept.save(update_fields=['response'])
+    except InsufficientStock as error:
+        raise ApiError(409, {'error': 'Not enough stock: %s' % error, 'bill': error.index})
+    except IntegrityError:
+        answer = _replay(endpoint, key, fingerprint) if key is not None else None
+        if answer is None:
+            raise
+        return answer, True
+    return answer, False
+
+
+# deletes the keys kept over POS_API_KEY_DAYS, called by runworker with purge_jobs
+def purge_keys():
+    return IdempotencyKey.objects.filter(created__lt=timezone.now() - timedelta(days=settings.POS_API_KEY_DAYS)).delete()[0]
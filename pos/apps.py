@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class PosConfig(AppConfig):
     name = 'pos'
+
+    def ready(self):
+        from . import signals                                                   # connects the cache invalidation receivers
+        from . import tasks                                                     # registers the background tasks
@@ -0,0 +1,144 @@
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.files.storage import FileSystemStorage
+from django.template.utils import get_app_template_dirs
+
+
+# pos/static is the whole admin theme (vendor plugins, scss sources, demo pages and images), most of which no
+# page loads. collectstatic only takes the files the templates name with {% static %}, and the fonts and
+# images their stylesheets point at; the rest stays out of STATIC_ROOT, out of the manifest's hashing and
+# compressing, and out of its failures on demo stylesheets that point at files the theme never shipped.
+#
+# The stylesheets and scripts every page loads are concatenated into the POS_STATIC_BUNDLES (a dashboard
+# only bundle keeps its charts off the other pages). They are ordinary static files to the storage, so the
+# manifest fingerprints them and whitenoise serves their .gz/.br copies with far-future cache headers.
+
+STATIC_TAG = re.compile(r"""{%\s*static\s+['"]([^'"]+)['"]""")
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)|@import\s+(['"])([^'"]+)\3""")
+CSS_AT_RULE = re.compile(r"""@(?:charset|import)\s[^;]*;""")
+
+
+def _template_dirs():
+    dirs = [d for engine in settings.TEMPLATES for d in engine.get('DIRS', [])]
+    return dirs + list(get_app_template_dirs('templates'))
+
+
+# every path the templates load with {% static %}
+def template_references():
+    references = set()
+    for directory in _template_dirs():
+        for root, dirs, files in os.walk(directory):
+            for name in files:
+                if name.endswith(('.html', '.txt')):
+                    with open(os.path.join(root, name), encoding='utf-8') as f:
+                        references.update(path.lstrip('/') for path in STATIC_TAG.findall(f.read()))
+    return references
+
+
+def _is_relative(url):
+    return not re.match(r'^(?:[a-z][a-z0-9+.-]*:|//|/|#)', url, re.I)
+
+
+# the static files a stylesheet points at, as paths relative to the static root
+def css_references(path, content):
+    references = set()
+    for match in CSS_URL.finditer(content):
+        url = match.group(2) or match.group(4)
+        if _is_relative(url):
+            references.add(posixpath.normpath(posixpath.join(posixpath.dirname(path), url.split('?')[0].split('#')[0])))
+    return references
+
+
+def _read(path):
+    with open(finders.find(path), encoding='utf-8-sig') as f:                   # some vendor files start with a BOM
+        return f.read()
+
+
+# the static files pages can load: the templates' references and, through the stylesheets, their fonts and
+# images. A bundle's sources are only collected when a template also loads them on their own.
+def referenced_files():
+    found, seen, pending = set(), set(), [(path, True) for path in template_references()]
+    while pending:
+        path, collect = pending.pop()
+        if (path, collect) in seen:
+            continue
+        seen.add((path, collect))
+        if path in settings.POS_STATIC_BUNDLES:
+            pending.extend((source, False) for source in settings.POS_STATIC_BUNDLES[path])
+            continue
+        if not finders.find(path):                                              # e.g. a theme stylesheet's missing demo image
+            continue
+        if collect:
+            found.add(path)
+        if path.endswith('.css'):
+            pending.extend((reference, True) for reference in css_references(path, _read(path)))
+    return found
+
+
+# a stylesheet moved into the bundle's directory: its relative urls are rewritten to still reach their files,
+# and its @import and @charset rules are returned apart, as only the top of the bundle may have them
+def _rebase_css(source, bundle, content):
+    def rebase(match):
+        url = match.group(2) or match.group(4)
+        if not _is_relative(url):
+            return match.group(0)
+        target = posixpath.relpath(posixpath.normpath(posixpath.join(posixpath.dirname(source), url)), posixpath.dirname(bundle))
+        return 'url("%s")' % target if match.group(2) else '@import "%s"' % target
+    at_rules = CSS_AT_RULE.findall(content)
+    return at_rules, CSS_URL.sub(rebase, CSS_AT_RULE.sub('', content))
+
+
+def build_bundle(name):
+    parts, head = [], []
+    for source in settings.POS_STATIC_BUNDLES[name]:
+        content = _read(source)
+        if name.endswith('.css'):
+            at_rules, content = _rebase_css(source, name, content)
+            head.extend(rule for rule in at_rules if rule not in head)
+        parts.append('/* %s */\n%s' % (source, content))
+    separator = '\n' if name.endswith('.css') else '\n;\n'                      # a script that does not end its last statement
+    return '\n'.join(head + [separator.join(parts)]) + '\n'
+
+
+# serves the POS_STATIC_BUNDLES, built from their sources into POS_STATIC_BUILD_DIR whenever they are
+# looked up: by runserver while developing, by collectstatic for a release
+class BundleFinder(finders.BaseFinder):
+    @property
+    def storage(self):                                                          # finders are cached, the setting is read on use
+        return FileSystemStorage(location=settings.POS_STATIC_BUILD_DIR)
+
+    def check(self, **kwargs):
+        return []
+
+    def build(self, name):
+        content = build_bundle(name)
+        path = self.storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def find(self, path, all=False):
+        if path not in settings.POS_STATIC_BUNDLES:
+            return []
+        return [self.build(path)] if all else self.build(path)
+
+    def list(self, ignore_patterns):
+        storage = self.storage
+        for name in settings.POS_STATIC_BUNDLES:
+            self.build(name)
+            yield name, storage
+
+
+# the app directories finder, but only the files of `pos` that referenced_files() reaches are collected;
+# other apps (the admin) are collected whole, and find() still sees every file
+class ReferencedAppDirectoriesFinder(finders.AppDirectoriesFinder):
+    def list(self, ignore_patterns):
+        referenced = referenced_files()
+        for path, storage in super().list(ignore_patterns):
+            if storage is not self.storages.get('pos') or path in referenced:
+                yield path, storage
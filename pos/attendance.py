@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, Q
+
+from .bulk import insert_rows
+from .models import Employee, EmployeeAttendence
+
+
+# saves a day of the attendance sheet, {employee id: present}, with one multi-row INSERT ... ON CONFLICT
+# (employee, date) DO UPDATE; submitting the same day again overwrites the marks instead of adding rows
+def mark_attendance(day, statuses):
+    quote = connection.ops.quote_name
+    day = connection.ops.adapt_datefield_value(day)
+    with transaction.atomic():
+        insert_rows(
+            'INSERT INTO %s (%s, %s, %s) VALUES' % (
+                quote(EmployeeAttendence._meta.db_table), quote('employee_id'), quote('date'), quote('status')),
+            [(pk, day, present) for pk, present in sorted(statuses.items())],
+            'ON CONFLICT (%s, %s) DO UPDATE SET %s = excluded.%s' % (quote('employee_id'), quote('date'), quote('status'), quote('status')),
+        )
+
+
+def statuses_on(day):
+    return dict(EmployeeAttendence.objects.filter(date=day).values_list('employee', 'status'))
+
+
+def _next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+# days present and days marked of every live employee in the month of `month` (a first of the month);
+# one grouped scan of the (date, employee, status) index, employees with no marks included as zeros
+def monthly_summary(month):
+    counts = EmployeeAttendence.objects.filter(date__gte=month, date__lt=_next_month(month)).order_by().values('employee').annotate(
+        marked=Count('id'), present=Count('id', filter=Q(status=True)),
+    )
+    counts = {row['employee']: (row['marked'], row['present']) for row in counts}
+    employees = Employee.objects.filter(is_deleted=False).order_by('name', 'id').only('name', 'designation')
+    summary = []
+    for employee in employees:
+        marked, present = counts.get(employee.pk, (0, 0))
+        summary.append({'employee': employee, 'marked': marked, 'present': present, 'absent': marked - present})
+    return summary
@@ -0,0 +1,235 @@
+import glob
+import hashlib
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from fpdf import FPDF
+
+from .models import PurchaseBill, PurchaseBillDetails, PurchaseItem, SaleBill, SaleBillDetails, SaleItem
+
+
+# printed bills: each bill is rendered to a PDF once and kept on disk under POS_BILL_PDF_DIR, named by bill
+# number and a hash of everything printed on it, so a reprint is a file read and a changed bill can never
+# be served from an old file; the cache remembers the current file of a bill so a reprint runs no query
+
+LAYOUT_VERSION = 2                                                              # part of the hash, bump it when the layout changes
+
+COMPANY = 'Data Electronics (Private) Limited'
+COMPANY_LINES = [
+    'DEALERS IN : CCTV Systems, Security Alarm Systems, Fire Alarm Systems, Guard Tour Systems & Access Control Systems.',
+    '301A, Attidiya Main Road, Attidiya, Dehiwala, Sri Lanka',
+    'EMAIL : datae@eureka.lk / data_e@sltnet.lk    Hot Line : +94 777 487 644',
+]
+
+MARGIN = 40
+ROW = 16
+
+
+def _sale_contents(billno):
+    bill = SaleBill.objects.get(billno=billno)
+    details = SaleBillDetails.objects.filter(billno=billno).first()
+    return {
+        'title'     : 'Sales Receipt',
+        'party'     : [('NAME OF CONSIGNEE / BUYER', bill.name), ('ADDRESS', bill.address), ('PHONE', bill.phone), ('EMAIL', bill.email)],
+        'signature' : 'For Customer',
+        'footer'    : 'thank you for purchasing from us!!!',
+        **_common(bill, SaleItem, details, []),
+    }
+
+
+def _purchase_contents(billno):
+    bill = PurchaseBill.objects.select_related('supplier').get(billno=billno)
+    details = PurchaseBillDetails.objects.filter(billno=billno).first()
+    supplier = bill.supplier
+    return {
+        'title'     : 'Purchase Receipt',
+        'party'     : [('SUPPLIER', supplier.name), ('ADDRESS', supplier.address), ('PHONE', supplier.phone), ('EMAIL', supplier.email)],
+        'signature' : 'FOR COMPANY',
+        'footer'    : '',
+        **_common(bill, PurchaseItem, details, [('BANK', 'bank'), ('AC NO', 'acno')]),
+    }
+
+
+def _common(bill, item_model, details, extra_fields):
+    fields = [('BOX NO', 'eway'), ('VEH NO', 'veh'), ('DESTINATION', 'destination'), ('DELIVERY DATE', 'po')] + extra_fields
+    return {
+        'billno'    : bill.billno,
+        'date'      : timezone.localtime(bill.time).date().isoformat(),
+        'items'     : [list(item) for item in item_model.objects.filter(billno=bill).order_by('id').values_list('stock__name', 'quantity', 'perprice', 'totalprice')],
+        'total'     : bill.total_price,
+        'details'   : [(label, getattr(details, field, None) or '') for label, field in fields],
+        'add'       : getattr(details, 'add', None) or '',
+        'net_total' : getattr(details, 'total', None) or '',
+    }
+
+
+KINDS = {
+    'sale'      : _sale_contents,
+    'purchase'  : _purchase_contents,
+}
+
+
+# an A4 page set in points from the top left corner, in the POS_BILL_PDF_FONTS when they are given; the
+# standard Helvetica otherwise, which needs no embedding but has only the cp1252 characters
+class _Document(FPDF):
+    def __init__(self):
+        super().__init__(unit='pt', format='A4', font_cache_dir=None)
+        self.set_auto_page_break(False)                                         # render_bill breaks the pages between items
+        self.fonts_given = bool(settings.POS_BILL_PDF_FONTS)
+        if self.fonts_given:
+            regular, bold = settings.POS_BILL_PDF_FONTS
+            self.add_font('bill', '', regular, uni=True)
+            self.add_font('bill', 'B', bold, uni=True)
+        else:
+            self.core_fonts_encoding = 'windows-1252'
+
+    def printable(self, text):
+        text = str(text)
+        return text if self.fonts_given else text.encode('cp1252', 'replace').decode('cp1252')
+
+    def use_font(self, size, bold):
+        self.set_font('bill' if self.fonts_given else 'helvetica', 'B' if bold else '', size)
+
+    # y is the baseline; align 'right' and 'center' place the text relative to x
+    def write_text(self, x, y, text, size=10, bold=False, align='left'):
+        text = self.printable(text)
+        self.use_font(size, bold)
+        if align == 'right':
+            x -= self.get_string_width(text)
+        elif align == 'center':
+            x -= self.get_string_width(text) / 2
+        self.text(x, y, text)
+
+    # the text split into lines no wider than `width`, a word too long for a line is cut
+    def wrap(self, text, width, size, bold=False):
+        self.use_font(size, bold)
+        return self.multi_cell(width, size, self.printable(text), split_only=True) or ['']
+
+    def draw_line(self, x1, y1, x2, y2, width=0.5):
+        self.set_line_width(width)
+        self.line(x1, y1, x2, y2)
+
+    def draw_rect(self, x, y, width, height, line_width=0.5):
+        self.set_line_width(line_width)
+        self.rect(x, y, width, height)
+
+
+def render_bill(contents):
+    document = _Document()
+    width = document.w - 2 * MARGIN
+    right = MARGIN + width
+
+    def page_header():
+        document.add_page()
+        y = MARGIN + 10
+        document.write_text(MARGIN + width / 2, y, contents['title'], 10, align='center')
+        y += 24
+        document.write_text(MARGIN + width / 2, y, COMPANY, 16, bold=True, align='center')
+        for line in COMPANY_LINES:
+            for part in document.wrap(line, width, 8):
+                y += 12
+                document.write_text(MARGIN + width / 2, y, part, 8, align='center')
+        y += 10
+        document.draw_line(MARGIN, y, right, y)
+        return y + 18
+
+    def table_header(y):
+        document.draw_rect(MARGIN, y - 12, width, ROW)
+        document.write_text(MARGIN + 4, y, 'NO', 9, bold=True)
+        document.write_text(MARGIN + 30, y, 'DESCRIPTION OF THE GOODS', 9, bold=True)
+        for x, label in ((right - 170, 'QTY'), (right - 90, 'PRICE PER'), (right - 4, 'AMOUNT RS')):
+            document.write_text(x, y, label, 9, bold=True, align='right')
+        return y + ROW
+
+    y = page_header()
+    document.write_text(MARGIN, y, 'INVOICE NO : %s' % contents['billno'], 10, bold=True)
+    document.write_text(right, y, 'DATE : %s' % contents['date'], 10, bold=True, align='right')
+    y += ROW
+    column = width / 2 - 10
+    left_y = right_y = y
+    for label, value in contents['party']:
+        for line in document.wrap('%s : %s' % (label, value), column, 9):
+            document.write_text(MARGIN, left_y, line, 9)
+            left_y += 12
+    for label, value in contents['details']:
+        document.write_text(MARGIN + width / 2 + 10, right_y, '%s : %s' % (label, value), 9)
+        right_y += 12
+    y = max(left_y, right_y) + 10
+
+    y = table_header(y)
+    for number, (name, quantity, perprice, totalprice) in enumerate(contents['items'], 1):
+        lines = document.wrap(name, right - 210 - MARGIN - 30, 9)
+        if y + len(lines) * 12 > document.h - MARGIN:
+            y = table_header(page_header())
+        document.write_text(MARGIN + 4, y, number, 9)
+        document.write_text(right - 170, y, quantity, 9, align='right')
+        document.write_text(right - 90, y, perprice, 9, align='right')
+        document.write_text(right - 4, y, totalprice, 9, align='right')
+        for line in lines:
+            document.write_text(MARGIN + 30, y, line, 9)
+            y += 12
+        document.draw_line(MARGIN, y - 8, right, y - 8, 0.25)
+        y += 4
+
+    if y + 120 > document.h - MARGIN:
+        y = page_header()
+    y += 8
+    for label, value, bold in (('ITEMS TOTAL', contents['total'], True), ('Discount/Other', contents['add'], False), ('TOTAL', contents['net_total'], True)):
+        document.write_text(right - 100, y, label, 10, bold=bold, align='right')
+        document.write_text(right - 4, y, value, 10, bold=bold, align='right')
+        y += ROW
+    y += 40
+    document.write_text(right, y, contents['signature'], 10, bold=True, align='right')
+    document.write_text(right, y + 14, 'Signature', 10, align='right')
+    if contents['footer']:
+        document.write_text(MARGIN + width / 2, y + 50, contents['footer'], 10, align='center')
+    return bytes(document.output())
+
+
+# what the file of a bill depends on besides the bill, so a layout or font change reprints the bills
+def _layout():
+    return [LAYOUT_VERSION, settings.POS_BILL_PDF_FONTS]
+
+
+def _cache_key(kind, billno):
+    return 'pos:bill-pdf:%s:%s:%s' % (hashlib.sha256(json.dumps(_layout()).encode()).hexdigest()[:8], kind, billno)
+
+
+def _file_name(kind, billno, digest):
+    return os.path.join(settings.POS_BILL_PDF_DIR, '%s-%s-%s.pdf' % (kind, billno, digest))
+
+
+# the path of the bill's pdf, rendering it if this version of the bill has not been printed before;
+# raises the model's DoesNotExist for an unknown bill
+def bill_pdf(kind, billno):
+    path = cache.get(_cache_key(kind, billno))
+    if path and os.path.exists(path):                                           # another process may have invalidated it
+        return path
+    contents = KINDS[kind](billno)
+    digest = hashlib.sha256(json.dumps([_layout(), contents], sort_keys=True, default=str).encode()).hexdigest()[:16]
+    path = _file_name(kind, billno, digest)
+    if not os.path.exists(path):
+        os.makedirs(settings.POS_BILL_PDF_DIR, exist_ok=True)
+        # written aside and renamed, so a concurrent reprint never reads half a file
+        fd, temporary = tempfile.mkstemp(dir=settings.POS_BILL_PDF_DIR, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(render_bill(contents))
+        os.chmod(temporary, 0o644)                                              # mkstemp makes it private, a web server may serve these
+        os.replace(temporary, path)
+    cache.set(_cache_key(kind, billno), path, settings.POS_BILL_PDF_CACHE_TIMEOUT)
+    return path
+
+
+# forgets the printed versions of a bill, after its details change or it is deleted (sqlite reuses the
+# number of the last bill once it is deleted, so a stale file could otherwise be served for a new bill)
+def invalidate_bill_pdf(kind, billno):
+    cache.delete(_cache_key(kind, billno))
+    for path in glob.glob(_file_name(kind, billno, '*')):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
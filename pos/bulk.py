@@ -0,0 +1,17 @@
+from django.db import connection
+
+
+# multi-row INSERT for the raw upserts of the attendance sheet, the rollups and the stock import:
+# "<insert> (%s, ...), (%s, ...), ... <conflict>" with as many rows a statement as the backend takes parameters
+# for. executemany of a one-row statement is a single call on sqlite but a round trip a row under psycopg2.
+# The rows of one statement must not share a conflict key, postgresql refuses to update a row twice in one
+def insert_rows(insert, rows, conflict=''):
+    if not rows:
+        return
+    width = len(rows[0])
+    placeholders = '(%s)' % ', '.join(['%s'] * width)
+    size = max(connection.ops.bulk_batch_size([None] * width, rows), 1)
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), size):
+            chunk = rows[start:start + size]
+            cursor.execute('%s %s %s' % (insert, ', '.join([placeholders] * len(chunk)), conflict), [value for row in chunk for value in row])
@@ -0,0 +1,93 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler, ASGIRequest
+from django.db import close_old_connections, connections
+
+
+# django 3.1 has no async ORM: a query made on the event loop raises SynchronousOnlyOperation, and a sync view
+# under ASGI is run thread_sensitive, on the one thread the process keeps for sync code, so a slow page holds
+# up every other request of the worker. The read views are run on the default thread pool instead, each pool
+# thread with its own connection, so under ASGI they overlap and a view can run independent queries at once.
+#
+# Under WSGI (and the test client) the async view is driven from the request's own thread, whose connection
+# may hold an open transaction; the work is sent back to that thread, so nothing changes there.
+
+
+def _call(func, args, kwargs):
+    close_old_connections()                                                     # what request_started/finished do for a request's own thread
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def in_thread(request, func, *args, **kwargs):
+    if isinstance(request, ASGIRequest):
+        return await sync_to_async(_call, thread_sensitive=False)(func, args, kwargs)
+    return await sync_to_async(func, thread_sensitive=True)(*args, **kwargs)
+
+
+# runs the calls (functions taking no arguments) at the same time, returns their results in order; under
+# WSGI one after the other, as tasks started by asyncio.gather are no longer sent back to the request's thread
+async def gather(request, *calls):
+    if isinstance(request, ASGIRequest):
+        return await asyncio.gather(*(in_thread(request, call) for call in calls))
+    return await in_thread(request, lambda: [call() for call in calls])
+
+
+def _render(view, request, *args, **kwargs):
+    response = view(request, *args, **kwargs)
+    if hasattr(response, 'render') and callable(response.render):
+        response.render()                                                       # a TemplateResponse runs its queries while rendering
+    return response
+
+
+# turns a sync view (or the as_view() of a class based one) into an async view run by in_thread
+def async_view(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await in_thread(request, _render, view, request, *args, **kwargs)
+    return wrapper
+
+
+def _headers(response):
+    headers = [(name.encode('ascii'), value.encode('latin1')) for name, value in response.items()]
+    return headers + [(b'Set-Cookie', cookie.output(header='').encode('ascii').strip()) for cookie in response.cookies.values()]
+
+
+def _finish_stream(response):
+    try:
+        response.close()                                                        # closes the generators, and their cursors, here
+    finally:
+        connections.close_all()                                                 # the thread ends with the response
+
+
+# django 3.1's ASGIHandler iterates a streaming response on the event loop, where the exports' queries raise
+# SynchronousOnlyOperation (and a file response blocks the loop on each read). This one takes each part of
+# the stream on a thread of its own, the same thread from the first part to the last as the rows come from
+# a cursor of that thread's connection; the request's context goes with them. DataElectronics/asgi.py
+# serves with it
+class StreamingASGIHandler(ASGIHandler):
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        await send({'type': 'http.response.start', 'status': response.status_code, 'headers': _headers(response)})
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        parts = iter(response)
+        with ThreadPoolExecutor(1, thread_name_prefix='stream') as thread:
+            try:
+                while True:
+                    part = await loop.run_in_executor(thread, context.run, next, parts, None)
+                    if part is None:
+                        break
+                    for chunk, last in self.chunk_bytes(part):
+                        await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            finally:
+                await loop.run_in_executor(thread, context.run, _finish_stream, response)
+        await send({'type': 'http.response.body'})
+        await sync_to_async(close_old_connections, thread_sensitive=True)()    # request_finished went to the stream thread
@@ -0,0 +1,17 @@
+from django.conf import settings
+
+from .versions import get_version
+
+
+# {{ versions.stock }} is the version of the pos.stock model (versions.py), read only when a template asks
+class Versions:
+    def __getitem__(self, model_name):
+        return get_version('pos.%s' % model_name)
+
+
+# what the {% cache %} fragments of the templates key and time out on
+def fragments(request):
+    return {
+        'versions'          : Versions(),
+        'fragment_timeout'  : settings.POS_FRAGMENT_CACHE_TIMEOUT,
+    }
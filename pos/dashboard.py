@@ -0,0 +1,73 @@
+from datetime import datetime, time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .concurrency import gather, in_thread
+from .models import PurchaseBill, SaleBill, Stock
+
+
+# the dashboard figures are computed once and kept in the cache until a bill or stock changes
+
+CACHE_KEY = 'pos:dashboard:%s'                                                  # one entry per day, so the "today" counts roll over at midnight
+
+
+def get_cache():
+    return caches[settings.POS_DASHBOARD_CACHE]
+
+
+# the independent queries behind the dashboard, by the key they fill
+def _queries(today):
+    start_of_day = timezone.make_aware(datetime.combine(today, time.min))
+    return {
+        'top_stocks'        : lambda: list(Stock.objects.filter(is_deleted=False).order_by('-quantity').values_list('name', 'quantity')[:settings.POS_DASHBOARD_TOP_STOCKS]),
+        'sales_totals'      : lambda: SaleBill.objects.aggregate(total=Sum('total_price'), today=Count('billno', filter=Q(time__gte=start_of_day))),
+        'sales'             : lambda: list(SaleBill.objects.order_by('-time').values('billno', 'name', 'time', 'total_price')[:3]),
+        'purchases'         : lambda: list(PurchaseBill.objects.order_by('-time').values('billno', 'supplier__name', 'time', 'total_price')[:3]),
+        'today_purchases'   : lambda: PurchaseBill.objects.filter(time__gte=start_of_day).count(),
+    }
+
+
+def _metrics(results):
+    return {
+        'labels'            : [name for name, quantity in results['top_stocks']],
+        'data'              : [quantity for name, quantity in results['top_stocks']],
+        'sales'             : results['sales'],
+        'purchases'         : results['purchases'],
+        'total_sales'       : results['sales_totals']['total'] or 0,
+        'today_customers'   : results['sales_totals']['today'],
+        'today_purchases'   : results['today_purchases'],
+    }
+
+
+def compute_dashboard_metrics(today):
+    return _metrics({key: query() for key, query in _queries(today).items()})
+
+
+def get_dashboard_metrics():
+    today = timezone.localdate()
+    cache = get_cache()
+    metrics = cache.get(CACHE_KEY % today.isoformat())
+    if metrics is None:
+        metrics = compute_dashboard_metrics(today)
+        cache.set(CACHE_KEY % today.isoformat(), metrics, settings.POS_DASHBOARD_CACHE_TIMEOUT)
+    return metrics
+
+
+# the same figures for an async view: on a cache miss the five queries run at the same time, one pool
+# thread and connection each, so the page costs the slowest query instead of their sum
+async def aget_dashboard_metrics(request):
+    today = timezone.localdate()
+    cache = get_cache()
+    metrics = await in_thread(request, cache.get, CACHE_KEY % today.isoformat())
+    if metrics is None:
+        queries = _queries(today)
+        metrics = _metrics(dict(zip(queries, await gather(request, *queries.values()))))
+        await in_thread(request, cache.set, CACHE_KEY % today.isoformat(), metrics, settings.POS_DASHBOARD_CACHE_TIMEOUT)
+    return metrics
+
+
+def invalidate_dashboard():
+    get_cache().delete(CACHE_KEY % timezone.localdate().isoformat())
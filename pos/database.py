@@ -0,0 +1,56 @@
+import os
+
+import dj_database_url
+
+
+# DATABASES['default'], built from the environment by settings.py (django_heroku is told to leave it alone).
+#
+# With DATABASE_URL (Heroku Postgres) connections are kept open between requests for DB_CONN_MAX_AGE seconds,
+# and checked at the start of each request (signals.check_connections) so one the server dropped is replaced
+# instead of failing the request. DB_POOL=true shares a bounded pool of connections between the threads of a
+# process instead (pos/pooled_postgresql); its size is DB_POOL_SIZE, or the plan's DB_MAX_CONNECTIONS shared
+# out over the WEB_CONCURRENCY gunicorn workers and one more process for runworker and manage.py.
+#
+# Without it the single node installs keep SQLite, switched to WAL (readers no longer wait on a writer) with
+# synchronous=NORMAL, and a writer that finds the database locked waits DB_SQLITE_TIMEOUT seconds for it.
+
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',                                                  # kept in the file, set again for a new one
+    'PRAGMA synchronous=NORMAL',                                                # durable at each checkpoint rather than each commit
+)
+
+
+def _flag(env, name, default):
+    return env.get(name, default).lower() in ('1', 'true', 'yes')
+
+
+def _max_age(env):
+    max_age = env.get('DB_CONN_MAX_AGE', '600')
+    return None if max_age == 'none' else int(max_age)                         # 'none' keeps them for the life of the process
+
+
+def pool_size(env=os.environ):
+    if env.get('DB_POOL_SIZE'):
+        return int(env['DB_POOL_SIZE'])
+    processes = int(env.get('WEB_CONCURRENCY', 1)) + 1
+    return max(1, int(env.get('DB_MAX_CONNECTIONS', 20)) // processes)
+
+
+def database_config(env=os.environ, sqlite_path=None, url_variable='DATABASE_URL'):
+    url = env.get(url_variable)
+    if not url:
+        return {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': sqlite_path,
+            'CONN_MAX_AGE': _max_age(env),
+            'OPTIONS': {'timeout': int(env.get('DB_SQLITE_TIMEOUT', 20))},      # the busy timeout, in seconds
+        }
+    config = dj_database_url.parse(url, conn_max_age=_max_age(env), ssl_require=_flag(env, 'DB_SSL_REQUIRE', 'true'))
+    if config['ENGINE'].startswith('django.db.backends.postgresql') and _flag(env, 'DB_POOL', 'false'):
+        config.update({
+            'ENGINE': 'pos.pooled_postgresql',
+            'CONN_MAX_AGE': 0,                                                  # handed back to the pool at the end of each request
+            'POOL_SIZE': pool_size(env),
+            'POOL_TIMEOUT': int(env.get('DB_POOL_TIMEOUT', 10)),                # seconds a request waits for a free connection
+        })
+    return config
@@ -0,0 +1,228 @@
+import csv
+import os
+import re
+import tempfile
+import zipfile
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import EmployeeAttendence, PurchaseBill, PurchaseItem, SaleBill, SaleItem, Stock
+from .ledger import stocks_as_of
+
+
+# exports stream: rows are read in server-side chunks, each chunk gets its items in one extra query,
+# and each chunk is encoded and sent before the next is read, so memory does not grow with the row count;
+# rows are fetched as tuples, building model instances would cost more than the whole encoding
+
+
+def _chunks(queryset):
+    size = settings.POS_EXPORT_CHUNK_SIZE
+    chunk = []
+    for row in queryset.iterator(chunk_size=size):
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _items_by_bill(item_model, bills):
+    # the items of one chunk of bills, grouped by bill number
+    items = defaultdict(list)
+    rows = item_model.objects.filter(billno__in=[bill[0] for bill in bills]).order_by('billno', 'id').values_list(
+        'billno', 'stock__name', 'quantity', 'perprice', 'totalprice')
+    for row in rows:
+        items[row[0]].append(row[1:])
+    return items
+
+
+# [start, end] dates as an aware half-open datetime range, so the filter stays on the indexed column
+def _time_range(queryset, start, end):
+    if start:
+        queryset = queryset.filter(time__gte=timezone.make_aware(datetime.combine(start, time.min)))
+    if end:
+        queryset = queryset.filter(time__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)))
+    return queryset
+
+
+def _bill_rows(bills, item_model):
+    zone = timezone.get_current_timezone()
+    for chunk in _chunks(bills):
+        items = _items_by_bill(item_model, chunk)
+        for billno, bill_time, *columns, total_price in chunk:
+            bill_time = bill_time.astimezone(zone).strftime('%Y-%m-%d %H:%M:%S')
+            for item in items[billno]:
+                yield [billno, bill_time, *columns, *item, total_price]
+
+
+def sale_rows(start=None, end=None):
+    yield ['Bill no', 'Time', 'Customer', 'Phone', 'Email', 'Stock', 'Quantity', 'Price per item', 'Item total', 'Bill total']
+    bills = _time_range(SaleBill.objects.order_by('time', 'billno'), start, end)
+    yield from _bill_rows(bills.values_list('billno', 'time', 'name', 'phone', 'email', 'total_price'), SaleItem)
+
+
+def purchase_rows(start=None, end=None, supplier=None):
+    yield ['Bill no', 'Time', 'Supplier', 'Stock', 'Quantity', 'Price per item', 'Item total', 'Bill total']
+    bills = _time_range(PurchaseBill.objects.order_by('time', 'billno'), start, end)
+    if supplier:
+        bills = bills.filter(supplier=supplier)
+    yield from _bill_rows(bills.values_list('billno', 'time', 'supplier__name', 'total_price'), PurchaseItem)
+
+
+# the live stocks, with their quantities from the ledger when an as-of date is given
+def stock_rows(as_of=None):
+    yield ['Id', 'Name', 'Model', 'Manufacturer', 'Quantity']
+    stocks = Stock.objects.filter(is_deleted=False).order_by('id')
+    if as_of:
+        stocks = stocks_as_of(timezone.make_aware(datetime.combine(as_of + timedelta(days=1), time.min)), stocks)
+    for chunk in _chunks(stocks.values_list('id', 'name', 'model', 'manufacturer', 'quantity_as_of' if as_of else 'quantity')):
+        yield from chunk
+
+
+def attendance_rows(start=None, end=None, employee=None):
+    yield ['Date', 'Employee', 'Designation', 'Present']
+    records = EmployeeAttendence.objects.order_by('date', 'id')
+    if start:
+        records = records.filter(date__gte=start)
+    if end:
+        records = records.filter(date__lte=end)
+    if employee:
+        records = records.filter(employee=employee)
+    for chunk in _chunks(records.values_list('date', 'employee__name', 'employee__designation', 'status')):
+        for date, name, designation, status in chunk:
+            yield [date.isoformat(), name, designation, 'Yes' if status else 'No']
+
+
+# a file-like object that keeps what is written to it until the response takes it
+class _Buffer:
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+class _TextBuffer:
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+    def write(self, text):
+        return self.buffer.write(text.encode('utf-8'))
+
+
+def _text(value):
+    # spreadsheet programs run cells starting with these as formulas
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        return "'" + value
+    return value
+
+
+def stream_csv(rows):
+    buffer = _Buffer()
+    writer = csv.writer(_TextBuffer(buffer))
+    for i, row in enumerate(rows):
+        writer.writerow([_text(value) for value in row])
+        if i % 500 == 0:                                                        # the header goes out on its own, straight away
+            yield buffer.take()
+    yield buffer.take()
+
+
+_INVALID_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="%s" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+def _cell(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return '<c t="inlineStr"><is><t xml:space="preserve">%s</t></is></c>' % escape(_INVALID_XML.sub('', str(value)))
+    return '<c><v>%s</v></c>' % value
+
+
+# a single-sheet workbook written row by row into a zip stream; zipfile falls back to data descriptors
+# when the file it writes to cannot seek, so nothing has to be held back until the end
+def stream_xlsx(rows, sheet):
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as workbook:
+        workbook.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        workbook.writestr('_rels/.rels', _ROOT_RELS)
+        workbook.writestr('xl/workbook.xml', _WORKBOOK % escape(sheet))
+        workbook.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        with workbook.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as worksheet:
+            worksheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                            b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            yield buffer.take()
+            for i, row in enumerate(rows):
+                worksheet.write(('<row>%s</row>' % ''.join(_cell(value) for value in row)).encode('utf-8'))
+                if i % 500 == 0:
+                    yield buffer.take()
+            worksheet.write(b'</sheetData></worksheet>')
+    yield buffer.take()
+
+
+FORMATS = {
+    'csv'   : ('text/csv; charset=utf-8', lambda rows, name: stream_csv(rows)),
+    'xlsx'  : ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', stream_xlsx),
+}
+
+
+def export_filename(name, fmt):
+    return '%s-%s.%s' % (name, timezone.localdate().strftime('%Y%m%d'), fmt)
+
+
+def export_response(rows, name, fmt):
+    content_type, stream = FORMATS[fmt]
+    response = StreamingHttpResponse(stream(rows, name.capitalize()), content_type=content_type)
+    response['Content-Disposition'] = 'attachment; filename="%s"' % export_filename(name, fmt)
+    return response
+
+
+# the same export written to a file under POS_EXPORT_DIR, for the background export job
+def export_file(rows, name, fmt):
+    content_type, stream = FORMATS[fmt]
+    os.makedirs(settings.POS_EXPORT_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=settings.POS_EXPORT_DIR, prefix=name + '-', suffix='.' + fmt)
+    with os.fdopen(fd, 'wb') as f:
+        for chunk in stream(rows, name.capitalize()):
+            f.write(chunk)
+    return {'file': path, 'name': export_filename(name, fmt), 'content_type': content_type}
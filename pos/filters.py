@@ -1,8 +1,12 @@
 import django_filters
-from .models import Stock    
+from .models import Stock
+from .search import search_stocks
 
 class StockFilter(django_filters.FilterSet):                            # Stockfilter used to filter based on name
-    name = django_filters.CharFilter(lookup_expr='icontains')           # allows filtering without entering the full name
+    name = django_filters.CharFilter(method='search')                   # ranked prefix search over name, model and manufacturer
     class Meta:
         model = Stock
-        fields = ['name']
\ No newline at end of file
+        fields = ['name']
+
+    def search(self, queryset, name, value):
+        return search_stocks(queryset, value)
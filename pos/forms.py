@@ -1,6 +1,25 @@
+from datetime import timedelta
+
 from django import forms
+from django.conf import settings
+from django.utils import timezone
 from .models import Stock,Supplier,PurchaseItem,PurchaseBill,PurchaseBillDetails,SaleBill,SaleItem,SaleBillDetails,Employee,EmployeeAttendence
 from django.forms import formset_factory
+from django.urls import reverse_lazy
+from .services import save_stock
+
+
+# select for a stock that only renders the chosen option; the other options are fetched from the
+# stock lookup endpoint as the user types, so a form row no longer carries the whole catalog
+class StockAutocompleteWidget(forms.Select):
+    def __init__(self, attrs=None):
+        super().__init__(attrs)
+        self.attrs['data-lookup-url'] = reverse_lazy('stock-search')
+
+    def optgroups(self, name, value, attrs=None):
+        selected = [pk for pk in value if str(pk).isdigit()]
+        self.choices = [('', '---------')] + [(stock.pk, str(stock)) for stock in Stock.objects.filter(pk__in=selected)]
+        return super().optgroups(name, value, attrs)
 
 class StockForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):                                                        # used to set css classes to the various fields
@@ -15,8 +34,30 @@ class StockForm(forms.ModelForm):
         model = Stock
         fields = ['name','model','manufacturer','description', 'quantity',]
 
+    def save(self, commit=True):                                                                # quantity changes go through the stock ledger
+        stock = super().save(commit=False)
+        if commit:
+            save_stock(stock)
+        return stock
+
+# csv upload of the stock import
+class StockImportForm(forms.Form):
+    file = forms.FileField()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['file'].widget.attrs.update({'class': 'form-control', 'accept': '.csv,text/csv'})
+
+# a new photo needs new thumbnails; the empty hash has them made once the person is saved (signals.py)
+class PhotoFormMixin:
+    def save(self, commit=True):
+        if 'photo_main' in self.changed_data:
+            self.instance.photo_hash = ''
+        return super().save(commit)
+
+
 # form used for supplier
-class SupplierForm(forms.ModelForm):
+class SupplierForm(PhotoFormMixin, forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['name'].widget.attrs.update({'class': 'textinput form-control', 'pattern' : '[a-zA-Z\s]{1,50}', 'title' : 'Alphabets and Spaces only'})
@@ -61,6 +102,9 @@ class PurchaseItemForm(forms.ModelForm):
     class Meta:
         model = PurchaseItem
         fields = ['stock', 'quantity', 'perprice']
+        widgets = {
+            'stock' : StockAutocompleteWidget()
+        }
 
 # formset used to render multiple 'PurchaseItemForm'
 PurchaseItemFormset = formset_factory(PurchaseItemForm, extra=1)
@@ -107,6 +151,9 @@ class SaleItemForm(forms.ModelForm):
     class Meta:
         model = SaleItem
         fields = ['stock', 'quantity', 'perprice']
+        widgets = {
+            'stock' : StockAutocompleteWidget()
+        }
 
 # formset used to render multiple 'SaleItemForm'
 SaleItemFormset = formset_factory(SaleItemForm, extra=1)
@@ -119,7 +166,7 @@ class SaleDetailsForm(forms.ModelForm):
 
 
 #employee forms
-class EmployeeForm(forms.ModelForm):
+class EmployeeForm(PhotoFormMixin, forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['name'].widget.attrs.update({'class': 'textinput form-control', 'pattern' : '[a-zA-Z\s]{1,50}', 'title' : 'Alphabets and Spaces only'})
@@ -149,10 +196,76 @@ class EmployeeForm(forms.ModelForm):
             ),
         }
 
-#EmployeeAttendence inputs
-class EmployeeAttendenceForm(forms.ModelForm):
-    class Meta:
-        model = EmployeeAttendence
-        fields = ['employee', 'status',]
+#one row of the daily attendance sheet; the employee is a plain id so a row costs no query to render or
+#validate, the formset checks all the ids with one query
+class EmployeeAttendenceForm(forms.Form):
+    employee = forms.IntegerField(widget=forms.HiddenInput)
+    status = forms.BooleanField(required=False)
+
+class BaseEmployeeAttendenceFormset(forms.BaseFormSet):
+    def clean(self):
+        if any(self.errors):
+            return
+        ids = [form.cleaned_data['employee'] for form in self.forms if form.cleaned_data]
+        if len(set(ids)) != len(ids):
+            raise forms.ValidationError("An employee appears twice on the sheet.")
+        if Employee.objects.filter(pk__in=ids, is_deleted=False).count() != len(ids):
+            raise forms.ValidationError("The sheet lists an employee who has been removed, reload it.")
+
+    def statuses(self):
+        return {form.cleaned_data['employee']: form.cleaned_data['status'] for form in self.forms if form.cleaned_data}
+
+EmployeeAttendenceFormset = formset_factory(EmployeeAttendenceForm, formset=BaseEmployeeAttendenceFormset, extra=0)
+
+#day shown on the attendance sheet and month of the attendance summary, read from the query string
+class AttendanceDayForm(forms.Form):
+    date = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
+
+    def clean_date(self):
+        return self.cleaned_data['date'] or timezone.localdate()
+
+class AttendanceMonthForm(forms.Form):
+    month = forms.DateField(required=False, input_formats=['%Y-%m'], widget=forms.DateInput(attrs={'type': 'month', 'class': 'form-control'}, format='%Y-%m'))
+
+    def clean_month(self):
+        return (self.cleaned_data['month'] or timezone.localdate()).replace(day=1)
+
+
+# filters of the csv/xlsx exports, read from the query string
+class ExportForm(forms.Form):
+    format = forms.ChoiceField(choices=[('csv', 'CSV'), ('xlsx', 'Excel')], required=False)
+    start = forms.DateField(required=False)
+    end = forms.DateField(required=False)
+
+    def clean_format(self):
+        return self.cleaned_data['format'] or 'csv'
+
+class PurchaseExportForm(ExportForm):
+    supplier = forms.ModelChoiceField(queryset=Supplier.objects.all(), required=False)
+
+class AttendanceExportForm(ExportForm):
+    employee = forms.ModelChoiceField(queryset=Employee.objects.all(), required=False)
+
+class StockExportForm(forms.Form):
+    format = ExportForm.base_fields['format']
+    as_of = forms.DateField(required=False)
+    clean_format = ExportForm.clean_format
+
+
+# date range of the sales report, the last POS_REPORT_DEFAULT_DAYS days unless given
+class ReportForm(forms.Form):
+    start = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
+    end = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
 
-EmployeeAttendenceFormset = formset_factory(EmployeeAttendenceForm, extra=1)
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.errors:
+            return cleaned_data
+        end = cleaned_data.get('end') or timezone.localdate()
+        start = cleaned_data.get('start') or end - timedelta(days=settings.POS_REPORT_DEFAULT_DAYS - 1)
+        if start > end:
+            raise forms.ValidationError("The start date is after the end date.")
+        if (end - start).days >= settings.POS_REPORT_MAX_DAYS:
+            raise forms.ValidationError("Reports cover at most %d days." % settings.POS_REPORT_MAX_DAYS)
+        cleaned_data.update(start=start, end=end)
+        return cleaned_data
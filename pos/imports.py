@@ -0,0 +1,178 @@
+import csv
+from itertools import islice
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .bulk import insert_rows
+from .dashboard import invalidate_dashboard
+from .forms import StockForm
+from .models import Stock, StockMovement
+from .search import index_stocks
+from .versions import bump_version
+
+
+# bulk stock catalog import: rows are cleaned with the StockForm fields, then upserted on 'model' a batch
+# at a time (one locking select, one multi-row upsert, one multi-row ledger insert per batch) instead of a
+# form save per row; StockForm.is_valid() is not used because its unique checks cost two queries a row
+
+COLUMNS = ['name', 'model', 'manufacturer', 'description', 'quantity']
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []                                                        # (line, row, message)
+
+    @property
+    def rows(self):
+        return self.created + self.updated + len(self.errors)
+
+
+# the field rules of StockForm (required, max_length, whole numbers) checked inline: Field.clean goes through
+# several calls a value and took a third of the import time; the form only hints quantity >= 0, here it is enforced
+_RULES = [(name, field.required, getattr(field, 'max_length', None)) for name, field in StockForm.base_fields.items()]
+
+
+def _clean(row):
+    cleaned, errors = {}, []
+    for name, required, max_length in _RULES:
+        value = (row.get(name) or '').strip()
+        if not value:
+            if required:
+                errors.append('%s: This field is required.' % name)
+            cleaned[name] = value
+        elif name == 'quantity':
+            try:
+                cleaned[name] = int(value)
+            except ValueError:
+                errors.append('quantity: Enter a whole number.')
+                continue
+            if cleaned[name] < 0:
+                errors.append('quantity: Ensure this value is greater than or equal to 0.')
+        elif max_length and len(value) > max_length:
+            errors.append('%s: Ensure this value has at most %d characters (it has %d).' % (name, max_length, len(value)))
+        else:
+            cleaned[name] = value
+    return cleaned, errors
+
+
+# one multi-row INSERT ... ON CONFLICT (model) DO UPDATE per batch, which is what bulk_create(update_conflicts=True)
+# does on newer Django; sqlite >= 3.24 and postgresql both have it. bulk_update builds a CASE per column over the
+# whole batch and was the slowest step of the import. The models of a batch are distinct, repeats are refused
+def _upsert(rows):
+    quote = connection.ops.quote_name
+    columns = COLUMNS + ['is_deleted']                                          # re-importing a deleted model brings it back
+    insert_rows(
+        'INSERT INTO %s (%s) VALUES' % (quote(Stock._meta.db_table), ', '.join(quote(name) for name in columns)),
+        [row + [False] for row in rows],
+        'ON CONFLICT (%s) DO UPDATE SET %s' % (
+            quote('model'), ', '.join('%s = excluded.%s' % (quote(name), quote(name)) for name in columns if name != 'model')),
+    )
+
+
+# (stock id, kind, delta) tuples into the ledger, in one multi-row INSERT; bulk_create spent longer preparing
+# the model instances than the database spent inserting them
+def _insert_movements(movements):
+    quote = connection.ops.quote_name
+    columns = ['stock_id', 'kind', 'delta', 'time']
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    insert_rows(
+        'INSERT INTO %s (%s) VALUES' % (quote(StockMovement._meta.db_table), ', '.join(quote(name) for name in columns)),
+        [movement + (now,) for movement in movements],
+    )
+
+
+# `seen` holds the models and names of the earlier batches, a repeated row is an error wherever it is in the file
+def _import_batch(batch, result, seen):
+    valid = []
+    batch_models, batch_names = set(), set()
+    for line, row in batch:
+        cleaned, errors = _clean(row)
+        if not errors and (cleaned['model'] in batch_models or cleaned['model'] in seen[0]):
+            errors.append('model: %s appears earlier in the file' % cleaned['model'])
+        if not errors and (cleaned['name'] in batch_names or cleaned['name'] in seen[1]):
+            errors.append('name: %s appears earlier in the file' % cleaned['name'])
+        if errors:
+            result.errors.append((line, row, '; '.join(errors)))
+            continue
+        batch_models.add(cleaned['model'])
+        batch_names.add(cleaned['name'])
+        valid.append((line, row, cleaned))
+    seen[0].update(batch_models)
+    seen[1].update(batch_names)
+    if not valid:
+        return
+    conflicts = []
+    try:
+        with transaction.atomic():
+            # the rows holding the batch's models, and those holding its names under another model, which
+            # would break the unique constraint on name
+            existing, taken = {}, {}
+            for model, name, pk, quantity in Stock.objects.select_for_update().filter(
+                    Q(model__in=batch_models) | Q(name__in=batch_names)).order_by('pk').values_list('model', 'name', 'pk', 'quantity'):
+                if model in batch_models:
+                    existing[model] = (pk, quantity)
+                else:
+                    taken[name] = model
+            rows, movements, created, pks = [], [], [], []
+            for line, row, cleaned in valid:
+                if cleaned['name'] in taken:
+                    conflicts.append((line, row, 'name: %s already belongs to model %s' % (cleaned['name'], taken[cleaned['name']])))
+                    continue
+                rows.append([cleaned[name] for name in COLUMNS])
+                if cleaned['model'] not in existing:
+                    created.append(cleaned['model'])
+                    continue
+                pk, quantity = existing[cleaned['model']]
+                pks.append(pk)
+                if quantity != cleaned['quantity']:
+                    movements.append((pk, StockMovement.ADJUSTMENT, cleaned['quantity'] - quantity))
+            _upsert(rows)
+            # sqlite does not return the ids of inserted rows, read them back for the ledger
+            new = Stock.objects.filter(model__in=created).values_list('pk', 'quantity')
+            for pk, quantity in new:
+                pks.append(pk)
+                if quantity:
+                    movements.append((pk, StockMovement.OPENING, quantity))
+            _insert_movements(movements)
+            index_stocks(pks)                                                   # bulk writes send no signals
+    except DatabaseError as error:                                              # e.g. a concurrent insert of the same name
+        result.errors.extend((line, row, 'not imported: %s' % error) for line, row, cleaned in valid)
+        return
+    result.errors.extend(conflicts)
+    result.created += len(created)
+    result.updated += len(rows) - len(created)
+
+
+# imports the stock rows of a csv text stream (header: name, model, manufacturer, description, quantity)
+def import_stocks(stream, batch_size=None):
+    batch_size = batch_size or settings.POS_IMPORT_BATCH_SIZE
+    result = ImportResult()
+    reader = csv.DictReader(stream)
+    missing = set(COLUMNS) - {'description'} - set(reader.fieldnames or [])
+    if missing:
+        result.errors.append((1, {}, 'missing columns: %s' % ', '.join(sorted(missing))))
+        return result
+    rows = ((reader.line_num, row) for row in reader)
+    seen = (set(), set())
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        _import_batch(batch, result, seen)
+    if result.created or result.updated:
+        bump_version('stock')
+        bump_version('pos.stock')                                               # bulk writes send no post_save
+        invalidate_dashboard()
+    return result
+
+
+def write_error_report(result, stream):
+    writer = csv.writer(stream)
+    writer.writerow(['line', 'error'] + COLUMNS)
+    for line, row, message in result.errors:
+        writer.writerow([line, message] + [row.get(name, '') for name in COLUMNS])
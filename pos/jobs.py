@@ -0,0 +1,124 @@
+import json
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+
+# a database backed job queue, so no broker has to run next to the app: requests enqueue() a job and return,
+# `manage.py runworker` claims due jobs and runs them in a process pool. A job is claimed with a conditional
+# UPDATE, so two workers never both take it, on sqlite as on postgresql. A claimed job stays invisible until
+# its lock (the task's timeout) runs out; if its worker dies it is claimed again then. A failed attempt is
+# retried after POS_JOB_RETRY_DELAY, doubled every attempt, up to the task's max_attempts.
+#
+# A job enqueued inside a transaction is committed (or rolled back) with it, so the worker can never see a
+# job whose data is not there yet.
+
+TASKS = {}
+
+
+class Task:
+    def __init__(self, func, name, queue, max_attempts, timeout):
+        self.func = func
+        self.name = name
+        self.queue = queue
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+
+    def __call__(self, *args):                                                  # run inline, as before
+        return self.func(*args)
+
+    def delay(self, *args, **kwargs):
+        return enqueue(self.name, *args, **kwargs)
+
+
+# registers the function as a task; its arguments and return value must be json serializable
+def task(name=None, queue='default', max_attempts=3, timeout=None):
+    def register(func):
+        TASKS[name or func.__name__] = Task(func, name or func.__name__, queue, max_attempts, timeout)
+        return TASKS[name or func.__name__]
+    return register
+
+
+def enqueue(name, *args, queue=None, delay=0):
+    task = TASKS[name]                                                          # KeyError for an unknown task, at the caller rather than in the worker
+    return Job.objects.create(
+        task=name, queue=queue or task.queue, args=json.dumps(args), max_attempts=task.max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+# queues one job of the task per argument tuple, with a single INSERT
+def enqueue_many(name, args_list, queue=None):
+    task = TASKS[name]
+    now = timezone.now()
+    return Job.objects.bulk_create(
+        Job(task=name, queue=queue or task.queue, args=json.dumps(list(args)), max_attempts=task.max_attempts, run_after=now) for args in args_list
+    )
+
+
+def worker_name():
+    return '%s:%d' % (socket.gethostname(), os.getpid())
+
+
+def _due(now):
+    return Q(status=Job.QUEUED, run_after__lte=now) | Q(status=Job.RUNNING, locked_until__lt=now)
+
+
+# takes up to `limit` due jobs of the queue for the worker, oldest first, and returns their ids
+def claim(queue, worker, limit):
+    now = timezone.now()
+    # a job whose worker died on its last attempt is not run again
+    Job.objects.filter(queue=queue, status=Job.RUNNING, locked_until__lt=now, attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, finished=now, locked_until=None, error='the worker did not finish the job in time')
+    claimed = []
+    for pk, name in Job.objects.filter(_due(now), queue=queue).order_by('run_after', 'id').values_list('pk', 'task')[:limit]:
+        timeout = name in TASKS and TASKS[name].timeout or settings.POS_JOB_TIMEOUT
+        if Job.objects.filter(_due(now), pk=pk).update(                         # 0 when another worker got it first
+                status=Job.RUNNING, attempts=F('attempts') + 1, worker=worker, locked_until=now + timedelta(seconds=timeout)):
+            claimed.append(pk)
+    return claimed
+
+
+# runs a claimed job and records the outcome; in the worker's pool processes
+def run_job(pk, worker):
+    job = Job.objects.get(pk=pk)
+    if job.status != Job.RUNNING or job.worker != worker:
+        return
+    mine = Job.objects.filter(pk=pk, status=Job.RUNNING, worker=worker, attempts=job.attempts)         # unless the lock ran out meanwhile
+    try:
+        if job.task not in TASKS:
+            raise LookupError("unknown task %s" % job.task)
+        result = TASKS[job.task].func(*json.loads(job.args))
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            delay = settings.POS_JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            mine.update(status=Job.QUEUED, locked_until=None, error=error, run_after=timezone.now() + timedelta(seconds=delay))
+        else:
+            mine.update(status=Job.FAILED, locked_until=None, error=error, finished=timezone.now())
+    else:
+        mine.update(status=Job.DONE, locked_until=None, result=json.dumps(result), finished=timezone.now())
+
+
+def job_result(job):
+    return json.loads(job.result) if job.result else None
+
+
+# deletes the jobs that finished over POS_JOB_KEEP_DAYS ago, with the files they produced
+def purge_jobs():
+    old = Job.objects.filter(status__in=[Job.DONE, Job.FAILED], finished__lt=timezone.now() - timedelta(days=settings.POS_JOB_KEEP_DAYS))
+    for job in old.exclude(result='').only('result'):
+        result = job_result(job)
+        if isinstance(result, dict) and 'file' in result:
+            try:
+                os.remove(result['file'])
+            except FileNotFoundError:
+                pass
+    return old.delete()[0]
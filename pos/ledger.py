@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DateTimeField, Exists, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Stock, StockCheckpoint, StockMovement
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)                            # stands in for "no checkpoint yet"
+
+
+# annotates the stocks with 'quantity_as_of': their last checkpoint at or before `when` plus the
+# movements between that checkpoint and `when`; both lookups are index range scans on (stock, time)
+def stocks_as_of(when, queryset=None):
+    queryset = Stock.objects.all() if queryset is None else queryset
+    checkpoints = StockCheckpoint.objects.filter(stock=OuterRef('pk'), time__lte=when).order_by('-time')
+    queryset = queryset.annotate(
+        checkpoint_time=Coalesce(Subquery(checkpoints.values('time')[:1]), Value(EPOCH), output_field=DateTimeField()),
+        checkpoint_quantity=Coalesce(Subquery(checkpoints.values('quantity')[:1]), Value(0), output_field=IntegerField()),
+    )
+    tail = StockMovement.objects.filter(
+        stock=OuterRef('pk'), time__gt=OuterRef('checkpoint_time'), time__lte=when,
+    ).order_by().values('stock').annotate(total=Sum('delta')).values('total')
+    return queryset.annotate(
+        quantity_as_of=Coalesce(Subquery(tail, output_field=IntegerField()), Value(0)) + F('checkpoint_quantity'),
+    )
+
+
+def quantity_as_of(stock, when):
+    return stocks_as_of(when, Stock.objects.filter(pk=stock.pk)).values_list('quantity_as_of', flat=True).get()
+
+
+# writes a checkpoint for every stock that moved since its last one; the cut-off trails the clock
+# by POS_STOCK_CHECKPOINT_LAG so postings still in flight cannot land behind it
+def checkpoint_stocks(when=None):
+    when = when or timezone.now() - timedelta(seconds=settings.POS_STOCK_CHECKPOINT_LAG)
+    moved = StockMovement.objects.filter(stock=OuterRef('pk'), time__gt=OuterRef('checkpoint_time'), time__lte=when)
+    with transaction.atomic():
+        stocks = stocks_as_of(when).filter(Exists(moved))
+        checkpoints = [StockCheckpoint(stock_id=pk, time=when, quantity=quantity) for pk, quantity in stocks.values_list('pk', 'quantity_as_of')]
+        StockCheckpoint.objects.bulk_create(checkpoints, batch_size=1000)
+    return len(checkpoints)
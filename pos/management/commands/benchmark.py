@@ -0,0 +1,218 @@
+import json
+import logging
+import platform
+import statistics
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.db.models import F
+from django.template.base import Template
+from django.test import Client, override_settings
+from django.urls import URLPattern, get_resolver, reverse
+from django.utils import timezone
+
+from pos.models import Employee, PurchaseBill, SaleBill, Stock, Supplier
+
+
+# the object whose fields fill the <pk>/<name>/<billno> of each route
+ROUTE_OBJECTS = {
+    'edit-stock'        : Stock,
+    'delete-stock'      : Stock,
+    'new-purchase'      : Supplier,
+    'edit-supplier'     : Supplier,
+    'delete-supplier'   : Supplier,
+    'supplier'          : Supplier,
+    'delete-purchase'   : PurchaseBill,
+    'purchase-bill'     : PurchaseBill,
+    'delete-sale'       : SaleBill,
+    'sale-bill'         : SaleBill,
+    'edit-employee'     : Employee,
+    'delete-employee'   : Employee,
+    'employee'          : Employee,
+}
+
+# extra query strings worth timing on their own
+VARIANTS = {
+    'inventory'     : ['', '?name=samsung'],
+    'stock-search'  : ['?q=sam'],
+}
+
+
+# the posting api takes POSTs, each timed request posts a batch of --api-bills bills of API_LINES lines
+API_LINES = 3
+API_TOKEN = 'benchmark'
+
+
+def sale_bill(lines):
+    return {'name': 'benchmark', 'phone': '0123456789', 'address': 'address', 'email': 'benchmark@example.com', 'nic': '123456789V', 'items': lines}
+
+
+def percentile(timings, fraction):
+    timings = sorted(timings)
+    return timings[min(int(len(timings) * fraction), len(timings) - 1)]
+
+
+# GETs every named url through the test client and records latency, query count and peak memory per view
+class Command(BaseCommand):
+    help = "Benchmarks every page against the current database and writes the results to JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20, help="timed requests per view")
+        parser.add_argument('--cold', action='store_true', help="clear the caches before every request")
+        parser.add_argument('--output', default='benchmark.json')
+        parser.add_argument('--compare', help="an earlier results file to diff against")
+        parser.add_argument('--threshold', type=float, default=0.2, help="p50 slowdown reported as a regression, 0.2 is 20%%")
+        parser.add_argument('--api-bills', type=int, default=100, help="bills in each request to the posting api")
+
+    def handle(self, *args, **options):
+        self.options = options
+        results = {}
+        # everything the run writes (the login session, anything a view saves) is rolled back
+        with transaction.atomic(), override_settings(ALLOWED_HOSTS=settings.ALLOWED_HOSTS + ['testserver'], POS_API_TOKEN=API_TOKEN):
+            client = Client(raise_request_exception=False)
+            client.force_login(User.objects.create_superuser('benchmark-%d' % time.time(), 'benchmark@example.com', None))
+            for name, url, body in self.urls():
+                results[name] = self.measure(client, url, body)
+                self.stdout.write("%-28s %3s  p50 %8.2f ms  p95 %8.2f ms  templates %8.2f ms  %3d queries  %8.1f KiB%s" % (
+                    name, results[name]['status'], results[name]['p50_ms'], results[name]['p95_ms'], results[name]['template_ms'],
+                    results[name]['queries'], results[name]['peak_kib'],
+                    '  %8.1f bills/s' % results[name]['bills_per_s'] if 'bills_per_s' in results[name] else ''))
+            transaction.set_rollback(True)
+        report = {
+            'meta'  : {
+                'time'      : timezone.now().isoformat(),
+                'python'    : platform.python_version(),
+                'django'    : django.get_version(),
+                'database'  : connection.vendor,
+                'debug'     : settings.DEBUG,
+                'requests'  : options['requests'],
+                'cold'      : options['cold'],
+                'rows'      : {model.__name__: model.objects.count() for model in (Stock, Supplier, Employee, SaleBill, PurchaseBill)},
+            },
+            'views' : results,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS("Wrote %s" % options['output']))
+        if options['compare']:
+            self.compare(report, options['compare'])
+
+    def urls(self):
+        for pattern in get_resolver().url_patterns:
+            if not isinstance(pattern, URLPattern) or not pattern.name:         # the admin include and the media files
+                continue
+            params = getattr(pattern.pattern, 'converters', {})
+            kwargs = {}
+            if params:
+                model = ROUTE_OBJECTS.get(pattern.name)
+                obj = model and model.objects.order_by('-pk').first()
+                if obj is None:
+                    self.stderr.write("skipping %s, nothing to fill %s with" % (pattern.name, ', '.join(params)))
+                    continue
+                kwargs = {param: getattr(obj, param) for param in params}
+            if pattern.name in ('api-sales', 'api-purchases'):
+                body = self.api_body(pattern.name)
+                if body is not None:
+                    yield pattern.name, reverse(pattern.name), body
+                continue
+            for query in VARIANTS.get(pattern.name, ['']):
+                yield pattern.name + query, reverse(pattern.name, kwargs=kwargs) + query, None
+
+    # a batch of bills for the posting api, over the live stocks, which are given enough units for every
+    # timed request (rolled back with the rest)
+    def api_body(self, name):
+        stocks = list(Stock.objects.filter(is_deleted=False).order_by('pk').values_list('pk', flat=True)[:100])
+        supplier = Supplier.objects.filter(is_deleted=False).order_by('pk').values_list('pk', flat=True).first()
+        if not stocks or (name == 'api-purchases' and supplier is None):
+            self.stderr.write("skipping %s, no stocks or suppliers to post" % name)
+            return None
+        Stock.objects.filter(pk__in=stocks).update(quantity=F('quantity') + 10 ** 7)
+        bills = []
+        for number in range(self.options['api_bills']):
+            lines = [{'stock': stocks[(number * API_LINES + i) % len(stocks)], 'quantity': 1, 'perprice': 100} for i in range(API_LINES)]
+            bills.append(sale_bill(lines) if name == 'api-sales' else {'supplier': supplier, 'items': lines})
+        return json.dumps({'bills': bills})
+
+    def request(self, client, url, body=None):
+        reset_queries()                                                         # DEBUG keeps every query otherwise
+        if self.options['cold']:
+            for cache in caches.all():
+                cache.clear()
+        self.template_time, self.render_depth = 0.0, 0
+        if body is not None:
+            return client.post(url, body, content_type='application/json', HTTP_AUTHORIZATION='Bearer ' + API_TOKEN)
+        return client.get(url)
+
+    # times the outermost template render of a request; includes and extends nest inside it
+    def timed_render(self, template, context):
+        self.render_depth += 1
+        start = time.perf_counter()
+        try:
+            return self.render(template, context)
+        finally:
+            self.render_depth -= 1
+            if not self.render_depth:
+                self.template_time += time.perf_counter() - start
+
+    def measure(self, client, url, body=None):
+        self.render = Template.render
+        Template.render = lambda template, context: self.timed_render(template, context)
+        self.request(client, url, body)                                         # warm up imports, templates and caches
+        logger = logging.getLogger('django.request')
+        logger.disabled = True                                                  # a failing view has logged its traceback once already
+        try:
+            result = self.measure_warm(client, url, body)
+        finally:
+            logger.disabled = False
+            Template.render = self.render
+        if body is not None:
+            result['bills_per_s'] = round(self.options['api_bills'] / result['p50_ms'] * 1000, 1)
+        return result
+
+    def measure_warm(self, client, url, body):
+        queries = []
+        with connection.execute_wrapper(lambda execute, sql, params, many, context: queries.append(sql) or execute(sql, params, many, context)):
+            tracemalloc.start()
+            response = self.request(client, url, body)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        timings, template_timings = [], []
+        for i in range(self.options['requests']):
+            start = time.perf_counter()
+            self.request(client, url, body)
+            timings.append((time.perf_counter() - start) * 1000)
+            template_timings.append(self.template_time * 1000)
+        return {
+            'url'         : url,
+            'status'      : response.status_code,
+            'p50_ms'      : round(percentile(timings, 0.5), 3),
+            'p95_ms'      : round(percentile(timings, 0.95), 3),
+            'mean_ms'     : round(statistics.mean(timings), 3),
+            'template_ms' : round(percentile(template_timings, 0.5), 3),           # p50 of the time spent rendering templates
+            'queries'     : len(queries),
+            'peak_kib'    : round(peak / 1024, 1),
+        }
+
+    def compare(self, report, path):
+        try:
+            with open(path) as f:
+                baseline = json.load(f)['views']
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError("Cannot read %s: %s" % (path, error))
+        regressions = 0
+        for name, result in report['views'].items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] if before['p50_ms'] else 0
+            if change > self.options['threshold'] or result['queries'] > before['queries']:
+                regressions += 1
+                self.stdout.write(self.style.WARNING("%-28s p50 %+.0f%% (%.2f -> %.2f ms), queries %d -> %d" % (
+                    name, change * 100, before['p50_ms'], result['p50_ms'], before['queries'], result['queries'])))
+        self.stdout.write("%d regressions against %s." % (regressions, path))
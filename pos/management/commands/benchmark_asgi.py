@@ -0,0 +1,118 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+
+from pos.concurrency import StreamingASGIHandler
+
+
+DEFAULT_URLS = ['dashboard', 'inventory', 'sales-list', 'purchases-list', 'sales-report']
+
+
+# concurrent GET throughput of the read pages through the WSGI handler (one thread, as a sync gunicorn worker,
+# and a pool of threads, as a gthread worker) and through the ASGI handler (one event loop, as a uvicorn worker),
+# all in this process against the current database; no server is involved, so the numbers compare the handlers
+class Command(BaseCommand):
+    help = "Compares concurrent-request throughput of the WSGI and ASGI deployments."
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='*', help="paths to request, default: %s" % ', '.join(DEFAULT_URLS))
+        parser.add_argument('--requests', type=int, default=200, help="requests per url and mode")
+        parser.add_argument('--concurrency', type=int, default=8, help="requests in flight at once")
+        parser.add_argument('--db-latency', type=float, default=0, help="milliseconds added to every query, a database across the network")
+        parser.add_argument('--output', help="also write the results to this JSON file")
+
+    def handle(self, *args, **options):
+        self.options = options
+        if options['db_latency']:
+            connection_created.connect(self.add_latency)
+            for connection in connections.all():
+                self.add_latency(None, connection)
+        urls = options['urls'] or [reverse(name) for name in DEFAULT_URLS]
+        modes = [
+            ('wsgi, 1 thread', self.run_wsgi, 1),
+            ('wsgi, %d threads' % options['concurrency'], self.run_wsgi, options['concurrency']),
+            ('asgi, %d in flight' % options['concurrency'], self.run_asgi, options['concurrency']),
+        ]
+        results = {}
+        with override_settings(ALLOWED_HOSTS=settings.ALLOWED_HOSTS + ['testserver'], POS_METRICS_SAMPLE_RATE=0):
+            wsgi, asgi = get_wsgi_application(), StreamingASGIHandler()            # the handler DataElectronics/asgi.py serves
+            for url in urls:
+                results[url] = {}
+                for name, run, concurrency in modes:
+                    run(wsgi if run == self.run_wsgi else asgi, url, concurrency, concurrency)             # warm up
+                    start = time.perf_counter()
+                    statuses = run(wsgi if run == self.run_wsgi else asgi, url, options['requests'], concurrency)
+                    rate = options['requests'] / (time.perf_counter() - start)
+                    results[url][name] = round(rate, 1)
+                    self.stdout.write("%-28s %-20s %8.1f req/s  %s" % (url, name, rate, ', '.join(sorted(set(statuses)))))
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'options': {key: options[key] for key in ('requests', 'concurrency', 'db_latency')}, 'results': results}, f, indent=2)
+            self.stdout.write(self.style.SUCCESS("Wrote %s" % options['output']))
+
+    def add_latency(self, sender, connection, **kwargs):
+        if self.sleep not in connection.execute_wrappers:                       # the signal comes again on every reconnect
+            connection.execute_wrappers.append(self.sleep)
+
+    def sleep(self, execute, sql, params, many, context):
+        time.sleep(self.options['db_latency'] / 1000)
+        return execute(sql, params, many, context)
+
+    def run_wsgi(self, application, url, count, concurrency):
+        path = urlsplit(url)
+
+        def request(i):
+            status = []
+            environ = RequestFactory()._base_environ(PATH_INFO=path.path, QUERY_STRING=path.query, REQUEST_METHOD='GET')
+            response = application(environ, lambda line, headers, exc_info=None: status.append(line))
+            try:
+                for chunk in response:
+                    pass
+            finally:
+                response.close()
+            return status[0].split()[0]
+
+        with ThreadPoolExecutor(concurrency) as pool:
+            return list(pool.map(request, range(count)))
+
+    def run_asgi(self, application, url, count, concurrency):
+        path = urlsplit(url)
+        scope = {
+            'type'          : 'http',
+            'asgi'          : {'version': '3.0'},
+            'http_version'  : '1.1',
+            'method'        : 'GET',
+            'scheme'        : 'http',
+            'path'          : path.path,
+            'query_string'  : path.query.encode(),
+            'headers'       : [(b'host', b'testserver')],
+            'server'        : ('testserver', 80),
+            'client'        : ('127.0.0.1', 0),
+        }
+
+        async def request(slots):
+            async with slots:
+                status = []
+                async def receive():
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                async def send(message):
+                    if message['type'] == 'http.response.start':
+                        status.append(str(message['status']))
+                await application(dict(scope), receive, send)
+                return status[0]
+
+        async def run():
+            slots = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(*(request(slots) for i in range(count)))
+
+        return asyncio.run(run())
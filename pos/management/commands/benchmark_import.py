@@ -0,0 +1,41 @@
+import csv
+import io
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from pos.imports import import_stocks
+
+
+BRANDS = ['Samsung', 'Sony', 'Philips', 'Panasonic', 'Toshiba', 'Canon', 'Nikon', 'Dell', 'Lenovo', 'Asus', 'Acer', 'Huawei']
+PRODUCTS = ['Television', 'Speaker', 'Monitor', 'Laptop', 'Camera', 'Router', 'Printer', 'Charger', 'Headphone', 'Keyboard']
+
+
+# times the catalog import on a generated file: a first pass creating every row, a second updating them all (rolled back afterwards)
+class Command(BaseCommand):
+    help = "Measures stock CSV import throughput in rows per second."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000)
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        data = io.StringIO()
+        writer = csv.writer(data)
+        writer.writerow(['name', 'model', 'manufacturer', 'description', 'quantity'])
+        for i in range(options['rows']):
+            brand = rng.choice(BRANDS)
+            writer.writerow(['%s %s B%d' % (brand, rng.choice(PRODUCTS), i), 'BENCH-%07d' % i, brand, '', rng.randint(0, 500)])
+        with transaction.atomic():
+            for label in ('create', 'update'):
+                data.seek(0)
+                start = time.perf_counter()
+                result = import_stocks(data, options['batch_size'])
+                elapsed = time.perf_counter() - start
+                self.stdout.write("%-7s %d rows in %.2fs: %d rows/s (%d created, %d updated, %d rejected)" % (
+                    label, result.rows, elapsed, result.rows / elapsed, result.created, result.updated, len(result.errors)))
+            transaction.set_rollback(True)
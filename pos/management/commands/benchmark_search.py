@@ -0,0 +1,57 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from pos.models import Stock
+from pos.search import rebuild_index, search_stocks
+
+
+BRANDS = ['Samsung', 'Sony', 'Philips', 'Panasonic', 'Toshiba', 'Canon', 'Nikon', 'Dell', 'Lenovo', 'Asus', 'Acer', 'Huawei']
+PRODUCTS = ['Television', 'Speaker', 'Monitor', 'Laptop', 'Camera', 'Router', 'Printer', 'Charger', 'Headphone', 'Keyboard']
+
+
+# compares the indexed stock search with the old name__icontains scan on a throwaway catalog
+class Command(BaseCommand):
+    help = "Times the stock search against the icontains scan on a generated catalog (rolled back afterwards)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stocks', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            self.stdout.write("Generating %d stocks..." % options['stocks'])
+            Stock.objects.bulk_create((
+                Stock(
+                    name='%s %s %d' % (rng.choice(BRANDS), rng.choice(PRODUCTS), i),
+                    model='M-%07d' % i,
+                    manufacturer=rng.choice(BRANDS),
+                    quantity=rng.randint(0, 500),
+                ) for i in range(options['stocks'])
+            ), batch_size=5000)
+            rebuild_index()
+            # half broad prefixes typed at the counter, half selective look-ups by model number
+            terms = [
+                rng.choice(BRANDS + PRODUCTS)[:rng.randint(2, 6)] if i % 2 else 'M-%07d' % rng.randrange(options['stocks'])
+                for i in range(options['queries'])
+            ]
+            live = Stock.objects.filter(is_deleted=False)
+            self.report('icontains', [self.time(lambda: list(live.filter(Q(name__icontains=term) | Q(model__icontains=term))[:10])) for term in terms])
+            self.report('search', [self.time(lambda: list(search_stocks(live, term)[:10])) for term in terms])
+            transaction.set_rollback(True)
+
+    def time(self, run):
+        start = time.perf_counter()
+        run()
+        return (time.perf_counter() - start) * 1000
+
+    def report(self, label, timings):
+        timings.sort()
+        self.stdout.write("%-10s p50 %7.2f ms   p95 %7.2f ms   mean %7.2f ms" % (
+            label, timings[len(timings) // 2], timings[int(len(timings) * 0.95) - 1], statistics.mean(timings)))
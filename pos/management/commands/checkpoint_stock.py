@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+from django.utils import timezone
+
+from pos.ledger import checkpoint_stocks, stocks_as_of
+
+
+# run periodically (cron, a scheduler) so "quantity as of" never has to sum more than one period of movements
+class Command(BaseCommand):
+    help = "Checkpoints the stock quantities from the ledger, or with --verify checks Stock.quantity against it."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help="report stocks whose quantity disagrees with the ledger")
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            drifted = stocks_as_of(timezone.now()).exclude(quantity=F('quantity_as_of')).values_list('pk', 'name', 'quantity', 'quantity_as_of')
+            for pk, name, quantity, expected in drifted:
+                self.stdout.write("Stock %s %s: quantity %d, ledger %d" % (pk, name, quantity, expected))
+            if drifted:
+                raise CommandError("%d stock(s) disagree with the ledger" % len(drifted))
+            self.stdout.write(self.style.SUCCESS("Stock quantities match the ledger"))
+            return
+        self.stdout.write(self.style.SUCCESS("Checkpointed %d stock(s)" % checkpoint_stocks()))
@@ -0,0 +1,102 @@
+import asyncio
+import re
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from pos.models import PurchaseBill, SaleBill, Employee, Supplier
+from pos.pagination import encode_cursor
+
+
+# plan lines that mean the whole table is read, per backend
+SEQUENTIAL_SCANS = {
+    'postgresql'    : re.compile(r'Seq Scan on (\w+)'),
+    'sqlite'        : re.compile(r'\bSCAN (?:TABLE )?(\w+)\b(?! USING)(?!.*INDEX)'),
+}
+
+
+# records every statement a view sends to the database, with its parameters, without running EXPLAIN inline
+class QueryRecorder:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+# renders each list/detail view and runs EXPLAIN on the queries it made, flagging full table scans
+class Command(BaseCommand):
+    help = "Runs EXPLAIN on the queries behind each view and reports sequential scans."
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='*', help="extra paths to check besides the built-in list")
+        parser.add_argument('--analyze', action='store_true', help="EXPLAIN ANALYZE on postgresql (executes the queries)")
+        parser.add_argument('--all', action='store_true', help="print every plan, not only the ones with scans")
+
+    def handle(self, *args, **options):
+        if connection.vendor not in SEQUENTIAL_SCANS:
+            raise CommandError("EXPLAIN parsing is not supported on %s." % connection.vendor)
+        self.analyze = options['analyze']
+        user = User.objects.filter(is_superuser=True).first() or User(username='explain')
+        factory = RequestFactory()
+        flagged = 0
+        for url in self.urls() + options['urls']:
+            request = factory.get(url)
+            request.user = user
+            match = resolve(request.path_info)
+            recorder = QueryRecorder()
+            try:
+                with connection.execute_wrapper(recorder):
+                    view = async_to_sync(match.func) if asyncio.iscoroutinefunction(match.func) else match.func     # queries come back to this thread
+                    response = view(request, *match.args, **match.kwargs)
+                    if hasattr(response, 'render'):
+                        response.render()
+            except Exception as error:                                           # report the plans we got and carry on with the next view
+                self.stderr.write("%s failed: %r" % (url, error))
+                response = None
+            status = response.status_code if response else 'error'
+            self.stdout.write(self.style.MIGRATE_HEADING("%s  (%s, %d queries)" % (url, status, len(recorder.queries))))
+            for sql, params in recorder.queries:
+                plan = self.explain(sql, params)
+                scans = sorted(set(SEQUENTIAL_SCANS[connection.vendor].findall(plan)))
+                if scans:
+                    flagged += 1
+                    self.stdout.write(self.style.WARNING("  sequential scan on %s" % ', '.join(scans)))
+                if scans or options['all']:
+                    self.stdout.write("    " + sql)
+                    self.stdout.write("    " + plan.replace('\n', '\n    '))
+        # small tables are scanned whatever the indexes, so run this against production-sized data
+        self.stdout.write("%d queries with sequential scans." % flagged)
+
+    def urls(self):
+        urls = [reverse(name) for name in ('dashboard', 'inventory', 'suppliers-list', 'employees-list', 'sales-list', 'purchases-list')]
+        urls += [reverse('inventory') + '?name=sam', reverse('stock-search') + '?q=sam']
+        sale = SaleBill.objects.order_by('-time', '-billno').first()
+        if sale:
+            urls.append(reverse('sale-bill', args=[sale.billno]))
+            urls.append(reverse('sales-list') + '?cursor=' + encode_cursor(['n', 2, [sale.time, sale.billno]]))      # a keyset page
+        purchase = PurchaseBill.objects.order_by('-time', '-billno').first()
+        if purchase:
+            urls.append(reverse('purchase-bill', args=[purchase.billno]))
+            urls.append(reverse('purchases-list') + '?cursor=' + encode_cursor(['n', 2, [purchase.time, purchase.billno]]))
+        supplier = Supplier.objects.filter(is_deleted=False).first()
+        if supplier:
+            urls.append(reverse('supplier', args=[supplier.name]))
+        employee = Employee.objects.filter(is_deleted=False).first()
+        if employee:
+            urls.append(reverse('employee', args=[employee.name]))
+        return urls
+
+    def explain(self, sql, params):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                return '\n'.join(row[-1] for row in cursor.fetchall())
+            cursor.execute(('EXPLAIN ANALYZE ' if self.analyze else 'EXPLAIN ') + sql, params)
+            return '\n'.join(row[0] for row in cursor.fetchall())
@@ -0,0 +1,149 @@
+import itertools
+import random
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from pos.models import (
+    Employee, PurchaseBill, PurchaseBillDetails, PurchaseItem, SaleBill, SaleBillDetails, SaleItem, Stock, StockMovement, Supplier,
+)
+from pos.dashboard import invalidate_dashboard
+from pos.rollups import rebuild_rollups
+from pos.search import rebuild_index
+from pos.versions import bump_version
+
+
+BRANDS = ['Samsung', 'Sony', 'Philips', 'Panasonic', 'Toshiba', 'Canon', 'Nikon', 'Dell', 'Lenovo', 'Asus', 'Acer', 'Huawei']
+PRODUCTS = ['Television', 'Speaker', 'Monitor', 'Laptop', 'Camera', 'Router', 'Printer', 'Charger', 'Headphone', 'Keyboard']
+FIRST_NAMES = ['Amal', 'Nimal', 'Kamal', 'Sunil', 'Chathura', 'Dilani', 'Ishara', 'Kasun', 'Nadeesha', 'Ruwan', 'Sanduni', 'Tharindu']
+LAST_NAMES = ['Perera', 'Silva', 'Fernando', 'Jayasinghe', 'Bandara', 'Wickramasinghe', 'Gunawardena', 'Dissanayake']
+DESIGNATIONS = ['Cashier', 'Sales Assistant', 'Store Keeper', 'Technician', 'Manager']
+
+
+# fills the database with a reproducible shop: stocks, suppliers, employees and bills whose item mix follows a zipf curve
+class Command(BaseCommand):
+    help = "Generates a synthetic dataset (same --seed, same data) for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stocks', type=int, default=1000)
+        parser.add_argument('--suppliers', type=int, default=50)
+        parser.add_argument('--employees', type=int, default=20)
+        parser.add_argument('--sales', type=int, default=10000)
+        parser.add_argument('--purchases', type=int, default=2000)
+        parser.add_argument('--max-items', type=int, default=5, help="items per bill are drawn from 1..max-items")
+        parser.add_argument('--zipf', type=float, default=1.1, help="skew of the item mix, 0 is uniform")
+        parser.add_argument('--days', type=int, default=90, help="bills are spread over this many days up to now")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        with transaction.atomic():
+            stocks = self.create_stocks(options['stocks'])
+            suppliers = self.create_suppliers(options['suppliers'])
+            self.create_employees(options['employees'])
+            # the few best sellers show up on most bills, as at a real counter
+            weights = list(itertools.accumulate(1 / rank ** options['zipf'] for rank in range(1, len(stocks) + 1)))
+            popular = self.rng.sample(stocks, len(stocks))
+            pick = lambda: self.rng.choices(popular, cum_weights=weights, k=self.rng.randint(1, options['max_items']))
+            moved = Counter()
+            self.create_bills(PurchaseBill, PurchaseItem, PurchaseBillDetails, options['purchases'], options['days'], pick, moved, StockMovement.PURCHASE,
+                              lambda: PurchaseBill(supplier=self.rng.choice(suppliers)))
+            self.create_bills(SaleBill, SaleItem, SaleBillDetails, options['sales'], options['days'], pick, moved, StockMovement.SALE,
+                              lambda: SaleBill(name=self.person(), phone='07%08d' % self.rng.randrange(10 ** 8), address='No. %d, Main Street, Colombo' % self.rng.randint(1, 500),
+                                               email='customer%d@example.com' % self.rng.randrange(10 ** 6), nic='%09dV' % self.rng.randrange(10 ** 9)))
+            # stock on hand is whatever was bought minus sold on top of an opening quantity large enough that no stock goes negative
+            opening = []
+            for stock in stocks:
+                stock.quantity += max(0, -moved[stock.pk] - stock.quantity)
+                if stock.quantity:
+                    opening.append(StockMovement(stock=stock, kind=StockMovement.OPENING, delta=stock.quantity, time=timezone.now() - timedelta(days=options['days'] + 1)))
+                stock.quantity += moved[stock.pk]
+            StockMovement.objects.bulk_create(opening, batch_size=self.batch_size)
+            Stock.objects.bulk_update(stocks, ['quantity'], batch_size=self.batch_size)
+        rebuild_index()
+        rebuild_rollups()                                                       # the bills were bulk created around the services
+        invalidate_dashboard()                                                  # bulk_create sends no signals
+        bump_version('stock')
+        self.stdout.write(self.style.SUCCESS("Generated %d stocks, %d suppliers, %d employees, %d purchases and %d sales." % (
+            options['stocks'], options['suppliers'], options['employees'], options['purchases'], options['sales'])))
+
+    def person(self):
+        return '%s %s' % (self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES))
+
+    def next_id(self, model):
+        return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1      # keeps the unique columns free when run twice
+
+    def create_stocks(self, count):
+        start = self.next_id(Stock)
+        Stock.objects.bulk_create((
+            Stock(
+                name='%s %s %d' % (self.rng.choice(BRANDS), self.rng.choice(PRODUCTS), i),
+                model='GEN-%07d' % i,
+                manufacturer=self.rng.choice(BRANDS),
+                quantity=self.rng.randint(0, 200),
+            ) for i in range(start, start + count)
+        ), batch_size=self.batch_size)
+        return list(Stock.objects.filter(pk__gte=start).order_by('pk'))
+
+    def create_suppliers(self, count):
+        start = self.next_id(Supplier)
+        Supplier.objects.bulk_create((
+            Supplier(
+                name='%s %s %d' % (self.rng.choice(BRANDS), 'Distributors', i),
+                phone='011%07d' % i,
+                address='No. %d, Industrial Zone, Colombo' % self.rng.randint(1, 500),
+                email='supplier%d@example.com' % i,
+                nic='S%08d' % i,
+                photo_main='photos/supplier.jpg',
+            ) for i in range(start, start + count)
+        ), batch_size=self.batch_size)
+        return list(Supplier.objects.filter(pk__gte=start))
+
+    def create_employees(self, count):
+        start = self.next_id(Employee)
+        Employee.objects.bulk_create((
+            Employee(
+                name='%s %d' % (self.person(), i),
+                designation=self.rng.choice(DESIGNATIONS),
+                phone='077%07d' % i,
+                address='No. %d, Lake Road, Kandy' % self.rng.randint(1, 500),
+                email='employee%d@example.com' % i,
+                nic='E%08d' % i,
+                photo_main='photos/employee.jpg',
+            ) for i in range(start, start + count)
+        ), batch_size=self.batch_size)
+
+    def create_bills(self, bill_model, item_model, details_model, count, days, pick, moved, kind, new_bill):
+        sign = -1 if kind == StockMovement.SALE else 1
+        now = timezone.now()
+        start = self.next_id(bill_model)
+        for offset in range(0, count, self.batch_size):
+            bills, items = [], []
+            for billno in range(start + offset, start + min(offset + self.batch_size, count)):
+                bill = new_bill()
+                bill.billno = billno                                            # set up front, sqlite does not hand back ids from bulk_create
+                bill_items = [item_model(billno=bill, stock=stock, quantity=self.rng.randint(1, 5), perprice=self.rng.randint(10, 2000) * 10) for stock in pick()]
+                for item in bill_items:
+                    item.totalprice = item.quantity * item.perprice
+                bill.total_price = sum(item.totalprice for item in bill_items)
+                bill.item_count = len(bill_items)
+                bills.append(bill)
+                items.extend(bill_items)
+            bill_model.objects.bulk_create(bills)
+            # bulk_create stamps auto_now with the current time; spread the bills out afterwards
+            for bill in bills:
+                bill.time = now - timedelta(seconds=self.rng.randrange(days * 86400))
+            bill_model.objects.bulk_update(bills, ['time'])
+            item_model.objects.bulk_create(items)
+            details_model.objects.bulk_create(details_model(billno=bill) for bill in bills)
+            movements = []
+            for item in items:
+                moved[item.stock_id] += sign * item.quantity
+                movements.append(StockMovement(stock_id=item.stock_id, kind=kind, billno=item.billno.billno, delta=sign * item.quantity, time=item.billno.time))
+            StockMovement.objects.bulk_create(movements)
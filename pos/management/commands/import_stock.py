@@ -0,0 +1,37 @@
+import csv
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pos.imports import import_stocks, write_error_report
+
+
+# imports a stock catalog csv: name, model, manufacturer, description, quantity (the opening balance)
+class Command(BaseCommand):
+    help = "Creates or updates (matched on model) the stocks listed in a CSV file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file, '-' reads standard input")
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--errors', help="write the rejected rows and their errors to this CSV file")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            if options['path'] == '-':
+                result = import_stocks(sys.stdin, options['batch_size'])
+            else:
+                with open(options['path'], newline='', encoding='utf-8-sig') as f:
+                    result = import_stocks(f, options['batch_size'])
+        except (OSError, csv.Error) as error:
+            raise CommandError(error)
+        elapsed = time.perf_counter() - start
+        if options['errors']:
+            with open(options['errors'], 'w', newline='') as f:
+                write_error_report(result, f)
+        else:
+            for line, row, message in result.errors[:20]:
+                self.stderr.write("line %d: %s" % (line, message))
+        self.stdout.write(self.style.SUCCESS("%d created, %d updated, %d rejected in %.2fs (%d rows/s)" % (
+            result.created, result.updated, len(result.errors), elapsed, result.rows / elapsed if elapsed else 0)))
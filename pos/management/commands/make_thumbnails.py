@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from pos.jobs import enqueue
+from pos.models import Employee, Supplier
+from pos.thumbnails import update_thumbnails
+
+
+# uploads make their own thumbnails; this is for the photos uploaded before, or after a change of the sizes
+class Command(BaseCommand):
+    help = "Strips EXIF from the supplier and employee photos and makes their thumbnails."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="also redo the photos that have thumbnails, e.g. after changing POS_THUMBNAIL_SIZES")
+        parser.add_argument('--background', action='store_true', help="queue a job per photo for `runworker` instead of running them here")
+
+    def handle(self, *args, **options):
+        done = missing = 0
+        for model in (Supplier, Employee):
+            people = model.objects.exclude(photo_main='')
+            if not options['force']:
+                people = people.filter(photo_hash='')
+            for pk in people.values_list('pk', flat=True).iterator():
+                if options['background']:
+                    enqueue('make_thumbnails', model.__name__, pk)
+                elif update_thumbnails(model.__name__, pk):
+                    done += 1
+                else:
+                    missing += 1
+                    self.stderr.write("%s %d: the photo is missing or not an image" % (model.__name__, pk))
+        if options['background']:
+            self.stdout.write(self.style.SUCCESS("Queued the photos for the worker"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Made the thumbnails of %d photo(s), %d skipped" % (done, missing)))
@@ -0,0 +1,24 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from pos.jobs import enqueue
+from pos.rollups import rebuild_rollups
+
+
+# the postings keep the rollups current; this is for bills written around them (imports, fixes in the shell)
+class Command(BaseCommand):
+    help = "Recomputes the daily sales and purchase rollups of a date range (all days by default) from the bills."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help="first day, YYYY-MM-DD")
+        parser.add_argument('--end', type=date.fromisoformat, help="last day, YYYY-MM-DD")
+        parser.add_argument('--background', action='store_true', help="queue it for `runworker` instead of running it here")
+
+    def handle(self, *args, **options):
+        if options['background']:
+            job = enqueue('rebuild_rollups', *[day and day.isoformat() for day in (options['start'], options['end'])])
+            self.stdout.write(self.style.SUCCESS("Queued as job %d" % job.pk))
+            return
+        days = rebuild_rollups(options['start'], options['end'])
+        self.stdout.write(self.style.SUCCESS("Rebuilt the rollups of %d day(s) with bills" % days))
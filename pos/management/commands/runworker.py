@@ -0,0 +1,96 @@
+import multiprocessing
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections, connections
+
+from pos.api import purge_keys
+from pos.jobs import claim, purge_jobs, run_job, worker_name
+
+
+PURGE_INTERVAL = 3600                                                           # seconds between two purges of old jobs and idempotency keys
+
+
+def _start_process():
+    django.setup()                                                              # a no-op when forked
+    signal.signal(signal.SIGINT, signal.SIG_IGN)                                # ctrl-c stops the worker, the running jobs still finish
+
+
+def _run_job(pk, worker):
+    close_old_connections()                                                     # each job is treated like a request
+    try:
+        run_job(pk, worker)
+    finally:
+        close_old_connections()
+
+
+# claims due jobs of its queues, no more of a queue at once than POS_JOB_QUEUES allows, and runs them in a
+# pool of processes; several workers, on one machine or many, can serve the same database
+class Command(BaseCommand):
+    help = "Runs the queued background jobs (exports, bill pdfs, rollup rebuilds) until stopped."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queues', help="comma separated queues to serve, all of POS_JOB_QUEUES by default")
+        parser.add_argument('--processes', type=int, help="size of the process pool, the sum of the queue limits by default")
+        parser.add_argument('--once', action='store_true', help="run the jobs due now and exit")
+
+    def handle(self, *args, **options):
+        queues = options['queues'].split(',') if options['queues'] else list(settings.POS_JOB_QUEUES)
+        unknown = set(queues) - set(settings.POS_JOB_QUEUES)
+        if unknown:
+            raise CommandError("Unknown queues: %s" % ', '.join(sorted(unknown)))
+        limits = {queue: settings.POS_JOB_QUEUES[queue] for queue in queues}
+        processes = options['processes'] or sum(limits.values())
+        worker = worker_name()
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        self.stdout.write("%s serving %s with %d processes" % (worker, ', '.join('%s (%d)' % item for item in limits.items()), processes))
+
+        running = {}                                                            # future: (queue, job id)
+        purged = 0
+        with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('fork'), initializer=_start_process) as pool:
+            try:
+                while not self.stopping:
+                    claimed, polled = [], False
+                    try:
+                        if time.monotonic() - purged > PURGE_INTERVAL:
+                            purge_jobs()
+                            purge_keys()
+                            purged = time.monotonic()
+                        for queue, limit in limits.items():
+                            free = limit - sum(1 for q, pk in running.values() if q == queue)
+                            if free > 0:
+                                claimed += [(queue, pk) for pk in claim(queue, worker, free)]
+                        polled = True
+                    except DatabaseError as error:                              # e.g. sqlite busy with a long job's write; try again on the next poll
+                        self.stderr.write("polling failed: %s" % error)
+                    if claimed:
+                        connections.close_all()                                 # a forked process must not share the connection's socket
+                        for queue, pk in claimed:
+                            running[pool.submit(_run_job, pk, worker)] = (queue, pk)
+                    if options['once'] and polled and not claimed and not running:
+                        break
+                    if not running:
+                        time.sleep(settings.POS_JOB_POLL_INTERVAL)
+                        continue
+                    done, pending = wait(running, timeout=settings.POS_JOB_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        queue, pk = running.pop(future)
+                        if isinstance(future.exception(), BrokenProcessPool):
+                            # a pool process died (killed, out of memory); its jobs are run again once their lock runs
+                            # out, and the worker exits so that its supervisor starts a fresh one
+                            raise CommandError("job %s: the pool is broken: %s" % (pk, future.exception()))
+                        if future.exception():
+                            self.stderr.write("job %s: %r" % (pk, future.exception()))
+            except KeyboardInterrupt:
+                pass
+            self.stdout.write("stopping, waiting for %d running job(s)" % len(running))
+        self.stdout.write("stopped")
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from pos.models import PurchaseBill, PurchaseItem, SaleBill, SaleItem
+
+
+# recomputes the stored 'total_price'/'item_count' of every bill from its items
+class Command(BaseCommand):
+    help = "Backfills (or with --verify only checks) the stored totals of sale and purchase bills."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help="report mismatching bills without fixing them")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        mismatches = 0
+        for bill_model, item_model in ((SaleBill, SaleItem), (PurchaseBill, PurchaseItem)):
+            mismatches += self.sync(bill_model, item_model, options['verify'], options['batch_size'])
+        if options['verify'] and mismatches:
+            raise CommandError("%d bill(s) have stale totals" % mismatches)
+        self.stdout.write(self.style.SUCCESS("Bill totals are in sync"))
+
+    def sync(self, bill_model, item_model, verify, batch_size):
+        items = item_model.objects.filter(billno=OuterRef('pk')).order_by().values('billno')
+        bills = bill_model.objects.order_by().annotate(
+            computed_total=Coalesce(Subquery(items.annotate(s=Sum('totalprice')).values('s'), output_field=IntegerField()), 0),
+            computed_count=Coalesce(Subquery(items.annotate(c=Count('id')).values('c'), output_field=IntegerField()), 0),
+        )
+        stale = []
+        for bill in bills.iterator(chunk_size=batch_size):
+            if bill.total_price == bill.computed_total and bill.item_count == bill.computed_count:
+                continue
+            self.stdout.write("%s %s: stored %d/%d, computed %d/%d" % (
+                bill_model.__name__, bill.billno, bill.total_price, bill.item_count, bill.computed_total, bill.computed_count))
+            bill.total_price = bill.computed_total
+            bill.item_count = bill.computed_count
+            stale.append(bill)
+        if stale and not verify:
+            with transaction.atomic():
+                bill_model.objects.bulk_update(stale, ['total_price', 'item_count'], batch_size=batch_size)
+        return len(stale)
@@ -0,0 +1,155 @@
+import threading
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.template.base import Template
+
+
+# per-process request metrics, filled by RequestMetricsMiddleware for the sampled requests and
+# rendered in the prometheus text format by the /metrics view; each gunicorn worker keeps its own
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_lock = threading.Lock()
+# the sample of the request being served; a context variable rather than a thread local because under ASGI
+# a request's queries run on pool threads, and asgiref carries the context there
+_sample = ContextVar('pos_request_sample', default=None)
+
+
+# what one sampled request spent, and on which statements
+class RequestSample:
+    def __init__(self):
+        self.queries = Counter()
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.render_depth = 0
+        self.lock = threading.Lock()                                            # an async view runs queries on several threads at once
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            with self.lock:
+                self.db_time += time.perf_counter() - start
+                self.queries[sql] += 1                                          # parameters are kept apart, so one statement per shape
+
+    def duplicates(self):
+        threshold = settings.POS_METRICS_DUPLICATE_THRESHOLD
+        return [(sql, count) for sql, count in self.queries.items() if count >= threshold]
+
+
+# running totals per view
+class ViewMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.duration = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.duplicates = 0
+        self.statuses = Counter()
+
+
+_views = defaultdict(ViewMetrics)
+
+
+def start_sample():
+    sample = RequestSample()
+    _sample.set(sample)
+    return sample
+
+
+def end_sample():
+    _sample.set(None)
+
+
+# the execute wrapper of every connection (see signals.py), so the queries are counted on whichever thread runs them
+def record_query(execute, sql, params, many, context):
+    sample = _sample.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    return sample.record_query(execute, sql, params, many, context)
+
+
+def record(view, status, duration, sample):
+    with _lock:
+        metrics = _views[view]
+        metrics.requests += 1
+        metrics.duration += duration
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if duration <= bound:
+                metrics.buckets[i] += 1
+        metrics.queries += sum(sample.queries.values())
+        metrics.db_time += sample.db_time
+        metrics.template_time += sample.template_time
+        metrics.duplicates += bool(sample.duplicates())
+        metrics.statuses[status] += 1
+
+
+def reset():
+    with _lock:
+        _views.clear()
+
+
+_render = Template.render
+
+
+# times the outermost template render of a sampled request; includes and extends nest inside it
+def _timed_render(self, context):
+    sample = _sample.get()
+    if sample is None:
+        return _render(self, context)
+    sample.render_depth += 1
+    start = time.perf_counter()
+    try:
+        return _render(self, context)
+    finally:
+        sample.render_depth -= 1
+        if not sample.render_depth:
+            sample.template_time += time.perf_counter() - start
+
+
+def install_template_timer():
+    Template.render = _timed_render
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_metrics():
+    lines = [
+        '# HELP pos_metrics_sample_rate Fraction of requests measured; divide the counters by it for totals.',
+        '# TYPE pos_metrics_sample_rate gauge',
+        'pos_metrics_sample_rate %s' % settings.POS_METRICS_SAMPLE_RATE,
+    ]
+    with _lock:
+        views = sorted(_views.items())
+        families = [
+            ('pos_requests_total', 'counter', 'Sampled requests by view and status.',
+             lambda view, m: [('{view="%s",status="%s"}' % (view, status), count) for status, count in sorted(m.statuses.items())]),
+            ('pos_request_duration_seconds', 'histogram', 'Time spent in the whole middleware chain.',
+             lambda view, m: [('_bucket{view="%s",le="%s"}' % (view, bound), count) for bound, count in zip(DURATION_BUCKETS, m.buckets)] + [
+                 ('_bucket{view="%s",le="+Inf"}' % view, m.requests),
+                 ('_sum{view="%s"}' % view, round(m.duration, 6)),
+                 ('_count{view="%s"}' % view, m.requests),
+             ]),
+            ('pos_request_db_queries_total', 'counter', 'Database queries run by sampled requests.',
+             lambda view, m: [('{view="%s"}' % view, m.queries)]),
+            ('pos_request_db_seconds_total', 'counter', 'Time spent waiting on the database.',
+             lambda view, m: [('{view="%s"}' % view, round(m.db_time, 6))]),
+            ('pos_request_template_seconds_total', 'counter', 'Time spent rendering templates.',
+             lambda view, m: [('{view="%s"}' % view, round(m.template_time, 6))]),
+            ('pos_request_duplicate_queries_total', 'counter', 'Requests that repeated one statement POS_METRICS_DUPLICATE_THRESHOLD times or more (N+1).',
+             lambda view, m: [('{view="%s"}' % view, m.duplicates)]),
+        ]
+        for name, kind, description, samples in families:
+            lines.append('# HELP %s %s' % (name, description))
+            lines.append('# TYPE %s %s' % (name, kind))
+            for view, metrics in views:
+                lines.extend('%s%s %s' % (name, suffix, value) for suffix, value in samples(_label(view), metrics))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import random
+import time
+
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import metrics, routers
+
+
+logger = logging.getLogger(__name__)
+
+
+# measures a sample of the requests: total time, database queries and time, template time, and repeated statements.
+# It works in both modes: a sync-only middleware would make Django 3.1 run every ASGI request through the one
+# thread it keeps for sync code, one request at a time
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine                # what MiddlewareMixin does to be awaited
+        metrics.install_template_timer()
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if random.random() >= settings.POS_METRICS_SAMPLE_RATE:                 # the rest of the requests pay for one random()
+            return self.get_response(request)
+        sample = metrics.start_sample()                                         # queries are counted by the connections' wrapper, see signals.py
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end_sample()
+        self.record(request, response, time.perf_counter() - start, sample)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= settings.POS_METRICS_SAMPLE_RATE:
+            return await self.get_response(request)
+        sample = metrics.start_sample()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end_sample()
+        self.record(request, response, time.perf_counter() - start, sample)
+        return response
+
+    def record(self, request, response, duration, sample):
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name or match.view_name if match else '<unresolved>'
+        metrics.record(view, response.status_code, duration, sample)
+        for sql, count in sample.duplicates():
+            logger.warning("%s ran the same query %d times: %s", view, count, sql)
+
+
+# WhiteNoise 5 is sync only and django_heroku puts it first in MIDDLEWARE, where it made Django 3.1 pass every
+# ASGI request between threads at each middleware below it (24 ms a request against 3 ms without it).
+# This one answers static files as WhiteNoise does and hands the rest on without leaving the event loop;
+# settings.py swaps it in
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        response = self.process_request(request)                                # a dict lookup, or a stat with autorefresh in DEBUG
+        if response is None:
+            response = await self.get_response(request)
+        return response
+
+
+# serves the POS_REPLICA_VIEWS from the replica (see pos/routers.py), unless the request writes or its session
+# is pinned to the primary, and pins a session that wrote. A streamed export keeps reading the replica while
+# it is sent, after this has returned
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+            self.process_view = self.aprocess_view                              # Django would run the sync one on its sync thread
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        state = routers.RequestState()
+        token = routers._state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers._state.reset(token)
+        return self.finish(response, state)
+
+    async def __acall__(self, request):
+        state = routers.RequestState()
+        token = routers._state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers._state.reset(token)
+        return self.finish(response, state)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = routers._state.get()
+        state.replica = (request.method in ('GET', 'HEAD') and request.resolver_match.url_name in settings.POS_REPLICA_VIEWS
+                         and routers.replica_configured() and not routers.is_pinned(request))
+        return None
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        ReplicaMiddleware.process_view(self, request, view_func, view_args, view_kwargs)     # the instance's process_view is this one
+
+    def finish(self, response, state):
+        if state.wrote:
+            seconds = settings.POS_REPLICA_PIN_SECONDS
+            response.set_cookie(routers.PIN_COOKIE, str(int(time.time() + seconds)), max_age=seconds, httponly=True, samesite='Lax')
+        if state.replica and response.streaming:
+            response.streaming_content = self.stream(response.streaming_content, state)
+        return response
+
+    # each chunk is made with the request's routing, set and reset around it in the caller's context
+    def stream(self, content, state):
+        content = iter(content)
+        while True:
+            token = routers._state.set(state)
+            try:
+                chunk = next(content)
+            except StopIteration:
+                return
+            finally:
+                routers._state.reset(token)
+            yield chunk
@@ -0,0 +1,146 @@
+# Generated by Django 3.1.7 on 2026-10-18 09:27
+
+import datetime
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# the tables as they were before the app had migrations: a database created back then already has them, and
+# `manage.py migrate --fake-initial` (the release step of the Procfile) records this one as applied instead of
+# failing on "table already exists"
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Employee',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=150)),
+                ('designation', models.CharField(max_length=150)),
+                ('phone', models.CharField(max_length=12, unique=True)),
+                ('address', models.CharField(max_length=200)),
+                ('birth_date', models.DateField(blank=True, default=datetime.datetime.now)),
+                ('email', models.EmailField(max_length=254, unique=True)),
+                ('nic', models.CharField(max_length=10, unique=True)),
+                ('joined_date', models.DateField(blank=True, default=datetime.datetime.now)),
+                ('photo_main', models.ImageField(blank=True, upload_to='photos/%Y/%m/%d/')),
+                ('is_deleted', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PurchaseBill',
+            fields=[
+                ('billno', models.AutoField(primary_key=True, serialize=False)),
+                ('time', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SaleBill',
+            fields=[
+                ('billno', models.AutoField(primary_key=True, serialize=False)),
+                ('time', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=150)),
+                ('phone', models.CharField(max_length=12)),
+                ('address', models.CharField(max_length=200)),
+                ('email', models.EmailField(max_length=254)),
+                ('nic', models.CharField(max_length=15)),
+            ],
+            options={
+                'ordering': ['nic'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Stock',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=30, unique=True)),
+                ('model', models.CharField(max_length=30, unique=True)),
+                ('manufacturer', models.CharField(max_length=30)),
+                ('description', models.TextField(blank=True)),
+                ('quantity', models.IntegerField(default=1)),
+                ('is_deleted', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Supplier',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=150)),
+                ('phone', models.CharField(max_length=12, unique=True)),
+                ('address', models.CharField(max_length=200)),
+                ('email', models.EmailField(max_length=254, unique=True)),
+                ('nic', models.CharField(max_length=10, unique=True)),
+                ('photo_main', models.ImageField(blank=True, upload_to='photos/%Y/%m/%d/')),
+                ('is_deleted', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SaleItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=1)),
+                ('perprice', models.IntegerField(default=1)),
+                ('totalprice', models.IntegerField(default=1)),
+                ('billno', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='salebillno', to='pos.salebill')),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saleitem', to='pos.stock')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SaleBillDetails',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('eway', models.CharField(blank=True, max_length=50, null=True)),
+                ('veh', models.CharField(blank=True, max_length=50, null=True)),
+                ('destination', models.CharField(blank=True, max_length=50, null=True)),
+                ('po', models.CharField(blank=True, max_length=50, null=True)),
+                ('add', models.CharField(blank=True, max_length=50, null=True)),
+                ('total', models.CharField(blank=True, max_length=50, null=True)),
+                ('billno', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saledetailsbillno', to='pos.salebill')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PurchaseItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=1)),
+                ('perprice', models.IntegerField(default=1)),
+                ('totalprice', models.IntegerField(default=1)),
+                ('billno', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='purchasebillno', to='pos.purchasebill')),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='purchaseitem', to='pos.stock')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PurchaseBillDetails',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('eway', models.CharField(blank=True, max_length=50, null=True)),
+                ('veh', models.CharField(blank=True, max_length=50, null=True)),
+                ('destination', models.CharField(blank=True, max_length=50, null=True)),
+                ('po', models.CharField(blank=True, max_length=50, null=True)),
+                ('bank', models.CharField(blank=True, max_length=50, null=True)),
+                ('acno', models.CharField(blank=True, max_length=50, null=True)),
+                ('add', models.CharField(blank=True, max_length=50, null=True)),
+                ('total', models.CharField(blank=True, max_length=50, null=True)),
+                ('billno', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='purchasedetailsbillno', to='pos.purchasebill')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='purchasebill',
+            name='supplier',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='purchasesupplier', to='pos.supplier'),
+        ),
+        migrations.CreateModel(
+            name='EmployeeAttendence',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('date', models.DateField(auto_now=True)),
+                ('status', models.BooleanField(default=False)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='employeeattendence', to='pos.employee')),
+            ],
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 3.1.7 on 2026-10-18 09:27
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_totals(apps, schema_editor):
+    for bill_model, item_model in (('SaleBill', 'SaleItem'), ('PurchaseBill', 'PurchaseItem')):
+        Bill = apps.get_model('pos', bill_model)
+        Item = apps.get_model('pos', item_model)
+        items = Item.objects.filter(billno=OuterRef('pk')).order_by().values('billno')
+        Bill.objects.update(
+            total_price=Coalesce(Subquery(items.annotate(s=Sum('totalprice')).values('s'), output_field=IntegerField()), 0),
+            item_count=Coalesce(Subquery(items.annotate(c=Count('id')).values('c'), output_field=IntegerField()), 0),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchasebill',
+            name='item_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='purchasebill',
+            name='total_price',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='salebill',
+            name='item_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='salebill',
+            name='total_price',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.1.7 on 2026-10-18 09:31
+
+from django.db import migrations
+
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE pos_stock_fts USING fts5(name, model, manufacturer, prefix='2 3')",
+    "INSERT INTO pos_stock_fts (rowid, name, model, manufacturer) SELECT id, name, model, manufacturer FROM pos_stock WHERE NOT is_deleted",
+]
+SQLITE_BACKWARD = [
+    "DROP TABLE IF EXISTS pos_stock_fts",
+]
+# on the expression django 3.1 compiles icontains to, UPPER("pos_stock"."name"::text) LIKE UPPER(%s); an index on
+# the bare column is never used for it
+POSTGRESQL_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS pos_stock_name_trgm ON pos_stock USING gin ((UPPER(name::text)) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS pos_stock_model_trgm ON pos_stock USING gin ((UPPER(model::text)) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS pos_stock_manufacturer_trgm ON pos_stock USING gin ((UPPER(manufacturer::text)) gin_trgm_ops)",
+]
+POSTGRESQL_BACKWARD = [
+    "DROP INDEX IF EXISTS pos_stock_name_trgm",
+    "DROP INDEX IF EXISTS pos_stock_model_trgm",
+    "DROP INDEX IF EXISTS pos_stock_manufacturer_trgm",
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pos', '0002_bill_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD}),
+            run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRESQL_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 3.1.7 on 2026-10-18 09:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pos', '0003_stock_search'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='salebill',
+            options={'ordering': ['-time', '-billno']},
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['name'], name='pos_employee_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(condition=models.Q(is_deleted=False), fields=['id'], name='pos_employee_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchasebill',
+            index=models.Index(fields=['-time', '-billno'], name='pos_purchasebill_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchasebill',
+            index=models.Index(fields=['supplier', '-time', '-billno'], name='pos_purchasebill_supp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salebill',
+            index=models.Index(fields=['-time', '-billno'], name='pos_salebill_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(condition=models.Q(is_deleted=False), fields=['id'], name='pos_stock_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(condition=models.Q(is_deleted=False), fields=['-quantity'], name='pos_stock_live_qty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supplier',
+            index=models.Index(fields=['name'], name='pos_supplier_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supplier',
+            index=models.Index(condition=models.Q(is_deleted=False), fields=['id'], name='pos_supplier_live_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 3.1.7 on 2026-10-18 09:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def opening_checkpoints(apps, schema_editor):
+    # the history before the ledger existed is summed up in one checkpoint per stock
+    Stock = apps.get_model('pos', 'Stock')
+    StockCheckpoint = apps.get_model('pos', 'StockCheckpoint')
+    now = django.utils.timezone.now()
+    StockCheckpoint.objects.bulk_create(
+        (StockCheckpoint(stock_id=pk, time=now, quantity=quantity) for pk, quantity in Stock.objects.values_list('pk', 'quantity').iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pos', '0004_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('opening', 'Opening quantity'), ('adjustment', 'Adjustment'), ('sale', 'Sale'), ('sale-reversal', 'Sale deleted'), ('purchase', 'Purchase'), ('purchase-reversal', 'Purchase deleted')], max_length=20)),
+                ('billno', models.IntegerField(blank=True, null=True)),
+                ('delta', models.IntegerField()),
+                ('time', models.DateTimeField(default=django.utils.timezone.now)),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='pos.stock')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('time', models.DateTimeField()),
+                ('quantity', models.IntegerField()),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='pos.stock')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['stock', 'time'], name='pos_movement_stock_time_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='stockcheckpoint',
+            constraint=models.UniqueConstraint(fields=('stock', 'time'), name='pos_checkpoint_stock_time_uniq'),
+        ),
+        migrations.RunPython(opening_checkpoints, migrations.RunPython.noop),
+    ]
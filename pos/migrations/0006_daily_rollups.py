@@ -0,0 +1,72 @@
+# Generated by Django 3.1.7 on 2026-10-18 10:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_rollups(apps, schema_editor):
+    from pos.rollups import rebuild_rollups
+    rebuild_rollups(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pos', '0005_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyTotal',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('sale_bills', models.IntegerField(default=0)),
+                ('sale_quantity', models.IntegerField(default=0)),
+                ('sale_amount', models.IntegerField(default=0)),
+                ('purchase_bills', models.IntegerField(default=0)),
+                ('purchase_quantity', models.IntegerField(default=0)),
+                ('purchase_amount', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailySupplierTotal',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('bills', models.IntegerField(default=0)),
+                ('quantity', models.IntegerField(default=0)),
+                ('amount', models.IntegerField(default=0)),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_totals', to='pos.supplier')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyStockTotal',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('sold_quantity', models.IntegerField(default=0)),
+                ('sold_amount', models.IntegerField(default=0)),
+                ('purchased_quantity', models.IntegerField(default=0)),
+                ('purchased_amount', models.IntegerField(default=0)),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_totals', to='pos.stock')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='dailysuppliertotal',
+            index=models.Index(fields=['date'], name='pos_dailysupplier_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailysuppliertotal',
+            constraint=models.UniqueConstraint(fields=('supplier', 'date'), name='pos_dailysupplier_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='dailystocktotal',
+            index=models.Index(fields=['date'], name='pos_dailystock_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailystocktotal',
+            constraint=models.UniqueConstraint(fields=('stock', 'date'), name='pos_dailystock_uniq'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
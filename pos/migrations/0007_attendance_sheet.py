@@ -0,0 +1,37 @@
+# Generated by Django 3.1.7 on 2026-10-18 10:09
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+import django.utils.timezone
+
+
+def drop_duplicate_days(apps, schema_editor):
+    # the old form could mark an employee several times a day, the last mark of each day is kept
+    EmployeeAttendence = apps.get_model('pos', 'EmployeeAttendence')
+    repeated = EmployeeAttendence.objects.values('employee', 'date').annotate(last=Max('id'), marks=Count('id')).filter(marks__gt=1)
+    for employee, date, last in repeated.values_list('employee', 'date', 'last'):
+        EmployeeAttendence.objects.filter(employee=employee, date=date).exclude(id=last).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pos', '0006_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='employeeattendence',
+            name='date',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.AddIndex(
+            model_name='employeeattendence',
+            index=models.Index(fields=['date', 'employee', 'status'], name='pos_attendance_date_idx'),
+        ),
+        migrations.RunPython(drop_duplicate_days, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='employeeattendence',
+            constraint=models.UniqueConstraint(fields=('employee', 'date'), name='pos_attendance_employee_date_uniq'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.1.7 on 2026-10-18 10:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pos', '0008_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='photo_hash',
+            field=models.CharField(blank=True, editable=False, max_length=16),
+        ),
+        migrations.AddField(
+            model_name='supplier',
+            name='photo_hash',
+            field=models.CharField(blank=True, editable=False, max_length=16),
+        ),
+    ]
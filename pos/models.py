@@ -1,5 +1,6 @@
 from django.db import models
 from datetime import datetime
+from django.utils import timezone
 
 # Create your models here.
 from django.contrib.auth.models import User
@@ -17,6 +18,58 @@ class Stock(models.Model):
     def __str__(self):
 	    return self.name
 
+    class Meta:
+        indexes = [
+            # the inventory list and the dashboard only ever look at live stocks
+            models.Index(fields=['id'], name='pos_stock_live_idx', condition=models.Q(is_deleted=False)),
+            models.Index(fields=['-quantity'], name='pos_stock_live_qty_idx', condition=models.Q(is_deleted=False)),
+        ]
+
+#append-only log of every change to a stock's quantity; Stock.quantity is the running total of it
+class StockMovement(models.Model):
+    OPENING = 'opening'
+    ADJUSTMENT = 'adjustment'
+    SALE = 'sale'
+    SALE_REVERSAL = 'sale-reversal'
+    PURCHASE = 'purchase'
+    PURCHASE_REVERSAL = 'purchase-reversal'
+    KINDS = [
+        (OPENING, 'Opening quantity'),
+        (ADJUSTMENT, 'Adjustment'),
+        (SALE, 'Sale'),
+        (SALE_REVERSAL, 'Sale deleted'),
+        (PURCHASE, 'Purchase'),
+        (PURCHASE_REVERSAL, 'Purchase deleted'),
+    ]
+
+    stock = models.ForeignKey(Stock, on_delete = models.CASCADE, related_name='movements')
+    kind = models.CharField(max_length=20, choices=KINDS)
+    billno = models.IntegerField(null=True, blank=True)                 # sale or purchase bill number, kept after the bill is deleted
+    delta = models.IntegerField()
+    time = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return "%s %+d (%s)" % (self.stock_id, self.delta, self.kind)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['stock', 'time'], name='pos_movement_stock_time_idx'),
+        ]
+
+#quantity of a stock at a point in time, so "quantity as of" only sums the movements after the nearest one
+class StockCheckpoint(models.Model):
+    stock = models.ForeignKey(Stock, on_delete = models.CASCADE, related_name='checkpoints')
+    time = models.DateTimeField()
+    quantity = models.IntegerField()
+
+    def __str__(self):
+        return "%s = %d at %s" % (self.stock_id, self.quantity, self.time)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['stock', 'time'], name='pos_checkpoint_stock_time_uniq'),
+        ]
+
 #contains suppliers
 class Supplier(models.Model):
     id = models.AutoField(primary_key=True)
@@ -26,16 +79,25 @@ class Supplier(models.Model):
     email = models.EmailField(max_length=254, unique=True)
     nic = models.CharField(max_length=10, unique=True)
     photo_main = models.ImageField(upload_to='photos/%Y/%m/%d/',blank=True)
+    photo_hash = models.CharField(max_length=16, blank=True, editable=False)              # names the thumbnails of photo_main, empty until they are made
     is_deleted = models.BooleanField(default=False)
 
     def __str__(self):
 	    return self.name
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['name'], name='pos_supplier_name_idx'),                                  # /suppliers/<name>
+            models.Index(fields=['id'], name='pos_supplier_live_idx', condition=models.Q(is_deleted=False)),
+        ]
+
 #contains the purchase bills made
 class PurchaseBill(models.Model):
     billno = models.AutoField(primary_key=True)
     time = models.DateTimeField(auto_now=True)
     supplier = models.ForeignKey(Supplier, on_delete = models.CASCADE, related_name='purchasesupplier')
+    total_price = models.IntegerField(default=0)                        # running sum of the items' totalprice, kept in step with PurchaseItem
+    item_count = models.IntegerField(default=0)
 
     def __str__(self):
 	    return "Bill no: " + str(self.billno)
@@ -44,11 +106,13 @@ class PurchaseBill(models.Model):
         return PurchaseItem.objects.filter(billno=self)
 
     def get_total_price(self):
-        purchaseitems = PurchaseItem.objects.filter(billno=self)
-        total = 0
-        for item in purchaseitems:
-            total += item.totalprice
-        return total
+        return self.total_price
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-time', '-billno'], name='pos_purchasebill_time_idx'),                  # newest first lists and today's count
+            models.Index(fields=['supplier', '-time', '-billno'], name='pos_purchasebill_supp_idx'),      # a supplier's bills, newest first
+        ]
 
 #contains the purchase stocks made
 class PurchaseItem(models.Model):
@@ -91,6 +155,9 @@ class SaleBill(models.Model):
     email = models.EmailField(max_length=254)
     nic = models.CharField(max_length=15)
 
+    total_price = models.IntegerField(default=0)                        # running sum of the items' totalprice, kept in step with SaleItem
+    item_count = models.IntegerField(default=0)
+
     def __str__(self):
 	    return "Bill no: " + str(self.billno)
 
@@ -98,13 +165,12 @@ class SaleBill(models.Model):
         return SaleItem.objects.filter(billno=self)
 
     def get_total_price(self):
-        saleitems = SaleItem.objects.filter(billno=self)
-        total = 0
-        for item in saleitems:
-            total += item.totalprice
-        return total
+        return self.total_price
     class Meta:
-        ordering = ['nic']
+        ordering = ['-time', '-billno']
+        indexes = [
+            models.Index(fields=['-time', '-billno'], name='pos_salebill_time_idx'),                      # newest first lists and today's count
+        ]
 
 #contains the sale stocks made
 class SaleItem(models.Model):
@@ -134,6 +200,62 @@ class SaleBillDetails(models.Model):
 	    return "Bill no: " + str(self.billno.billno)
 
 
+#daily rollups of the bills, kept in step by the posting services (see rollups.py) so reports never scan the items;
+#days are local dates of the bill times
+
+#units and amounts of one stock sold and bought on one day
+class DailyStockTotal(models.Model):
+    date = models.DateField()
+    stock = models.ForeignKey(Stock, on_delete = models.CASCADE, related_name='daily_totals')
+    sold_quantity = models.IntegerField(default=0)
+    sold_amount = models.IntegerField(default=0)
+    purchased_quantity = models.IntegerField(default=0)
+    purchased_amount = models.IntegerField(default=0)
+
+    def __str__(self):
+        return "%s on %s" % (self.stock_id, self.date)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['stock', 'date'], name='pos_dailystock_uniq'),                # also serves one stock's series
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='pos_dailystock_date_idx'),                              # every stock over a date range
+        ]
+
+#purchases from one supplier on one day
+class DailySupplierTotal(models.Model):
+    date = models.DateField()
+    supplier = models.ForeignKey(Supplier, on_delete = models.CASCADE, related_name='daily_totals')
+    bills = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+    amount = models.IntegerField(default=0)
+
+    def __str__(self):
+        return "%s on %s" % (self.supplier_id, self.date)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['supplier', 'date'], name='pos_dailysupplier_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='pos_dailysupplier_date_idx'),
+        ]
+
+#all the sales and purchases of one day
+class DailyTotal(models.Model):
+    date = models.DateField(unique=True)
+    sale_bills = models.IntegerField(default=0)
+    sale_quantity = models.IntegerField(default=0)
+    sale_amount = models.IntegerField(default=0)
+    purchase_bills = models.IntegerField(default=0)
+    purchase_quantity = models.IntegerField(default=0)
+    purchase_amount = models.IntegerField(default=0)
+
+    def __str__(self):
+        return str(self.date)
+
+
 class Employee(models.Model):
     id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=150)
@@ -145,13 +267,86 @@ class Employee(models.Model):
     nic = models.CharField(max_length=10, unique=True)
     joined_date = models.DateField(default=datetime.now, blank=True)
     photo_main = models.ImageField(upload_to='photos/%Y/%m/%d/',blank=True)
+    photo_hash = models.CharField(max_length=16, blank=True, editable=False)              # names the thumbnails of photo_main, empty until they are made
     is_deleted = models.BooleanField(default=False)
 
     def __str__(self):
 	    return self.name
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['name'], name='pos_employee_name_idx'),                                  # /employee/<name>
+            models.Index(fields=['id'], name='pos_employee_live_idx', condition=models.Q(is_deleted=False)),
+        ]
+
+#one row per employee and day, marked from the daily attendance sheet
 class EmployeeAttendence(models.Model):
     id = models.AutoField(primary_key=True)
-    date = models.DateField(auto_now=True)
+    date = models.DateField(default=timezone.localdate)               # the day marked, any day of the sheet rather than the day saved
     employee = models.ForeignKey(Employee, on_delete = models.CASCADE, related_name='employeeattendence')
     status = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'date'], name='pos_attendance_employee_date_uniq'),   # re-submitting a day overwrites it
+        ]
+        indexes = [
+            models.Index(fields=['date', 'employee', 'status'], name='pos_attendance_date_idx'),              # covers the monthly summary
+        ]
+
+#a unit of background work, queued by the web process and run by `manage.py runworker` (see jobs.py)
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    queue = models.CharField(max_length=50, default='default')
+    task = models.CharField(max_length=100)
+    args = models.TextField(default='[]')                               # json list of the task's arguments
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)              # not picked up before, pushed back between retries
+    locked_until = models.DateTimeField(null=True, blank=True)          # a running job whose worker has not finished by then is run again
+    worker = models.CharField(max_length=100, blank=True)
+    result = models.TextField(blank=True)                               # json of what the task returned
+    error = models.TextField(blank=True)                                # traceback of the last failed attempt
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return "%s #%s (%s)" % (self.task, self.pk, self.status)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['queue', 'status', 'run_after'], name='pos_job_claim_idx'),             # the worker's poll, due and expired jobs
+            models.Index(fields=['status', 'finished'], name='pos_job_finished_idx'),                    # purging old jobs
+        ]
+
+
+#the response to a posting api request that came with an Idempotency-Key, replayed when the client sends the
+#same key again (a retry after a timeout) instead of posting the bills twice; see api.py
+class IdempotencyKey(models.Model):
+    endpoint = models.CharField(max_length=20)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)                       # sha256 of the request body, a key reused for another request is refused
+    response = models.TextField(blank=True)                             # json of what the request returned
+    created = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return "%s %s" % (self.endpoint, self.key)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['endpoint', 'key'], name='pos_idempotency_key_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['created'], name='pos_idempotency_created_idx'),                        # purging old keys
+        ]
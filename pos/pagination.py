@@ -0,0 +1,216 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+
+
+# cursor (keyset) pagination: a page is fetched with "WHERE key after <last row> ORDER BY key LIMIT n"
+# instead of "OFFSET n", so deep pages cost the same as the first one and no COUNT(*) is needed
+
+
+def _json_default(value):
+    # full isoformat, DjangoJSONEncoder would cut datetimes to milliseconds and break ties on the key
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_cursor(data):
+    return base64.urlsafe_b64encode(json.dumps(data, default=_json_default).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        return json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except ValueError:
+        return None
+
+
+# the row count for the page footer, from the planner statistics on postgresql when the table is not filtered
+def estimate_count(queryset):
+    if connection.vendor == 'postgresql' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s', [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] >= 0:
+            return int(row[0])
+    return queryset.count()
+
+
+# stands in for django's Page in the list templates
+class CursorPage:
+    def __init__(self, object_list, number, previous_query, next_query, first_query, last_query, count=None, window=()):
+        self.object_list = object_list
+        self.number = number                                                    # None after jumping to the last page without a count
+        self.previous_query = previous_query
+        self.next_query = next_query
+        self.first_query = first_query
+        self.last_query = last_query
+        self.count = count
+        self.window = window                                                    # (number, query) of the pages around, None for this one
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_previous(self):
+        return self.previous_query is not None
+
+    def has_next(self):
+        return self.next_query is not None
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+
+class CursorPaginationMixin:
+    paginate_by = 10
+    cursor_ordering = ('-pk',)                                                  # must end in a unique field; None pages by position
+    cursor_query_param = 'cursor'
+    cursor_count = False                                                        # True adds an (estimated) row count to the page
+    cursor_window = 2                                                           # numbered pages linked on either side of this one
+
+    def get_cursor_ordering(self):
+        return self.cursor_ordering
+
+    def _ordering_fields(self, queryset, ordering):
+        fields = []
+        for key in ordering:
+            name = key.lstrip('-')
+            field = queryset.model._meta.pk if name == 'pk' else queryset.model._meta.get_field(name)
+            fields.append((name, field, key.startswith('-')))
+        return fields
+
+    # (direction, page number, position) of the cursor in the query string, the position as python values of
+    # the ordering fields (or a row offset without ordering); the first page for a cursor that is not one of ours
+    def _read_cursor(self, fields):
+        first = ('n', 1, None)
+        cursor = decode_cursor(self.request.GET.get(self.cursor_query_param, ''))
+        if not isinstance(cursor, list) or len(cursor) != 3:
+            return first
+        direction, number, position = cursor
+        if direction not in ('n', 'p') or not (number is None and fields is not None or type(number) is int and number >= 1):
+            return first
+        if position is None:
+            return direction, number, None
+        if fields is None:
+            return (direction, number, position) if type(position) is int and position >= 0 else first
+        if not isinstance(position, list) or len(position) != len(fields):
+            return first
+        try:
+            return direction, number, [field.to_python(value) for (name, field, descending), value in zip(fields, position)]
+        except (ValidationError, TypeError, ValueError):
+            return first
+
+    def _after(self, fields, values, reverse):
+        # (a, b) after (x, y) is "a > x OR (a = x AND b > y)", with > turned into < for descending keys
+        condition = Q()
+        equal = Q()
+        for (name, field, descending), value in zip(fields, values):
+            lookup = 'gt' if descending == reverse else 'lt'
+            condition |= equal & Q(**{'%s__%s' % (name, lookup): value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def _query(self, data):
+        query = self.request.GET.copy()
+        query.pop('page', None)
+        if data is None:
+            query.pop(self.cursor_query_param, None)
+        else:
+            query[self.cursor_query_param] = encode_cursor(data)
+        return '?' + query.urlencode()
+
+    # (number, query) of the window of pages around page `number`, from the rows read on either side of it
+    # (nearest first) and the cursors that lead to each neighbour: `cursors(j)` is the data of the query of the
+    # page j away, j < 0 before this one
+    def _window(self, number, size, before, after, cursors):
+        if number is None:
+            return []
+        window = [(number, None)]
+        for j in range(1, self.cursor_window + 1):
+            if number - j >= 1 and len(before) > size * (j - 1):
+                window.insert(0, (number - j, self._query(cursors(-j))))
+            if len(after) > size * (j - 1):
+                window.append((number + j, self._query(cursors(j))))
+        return window
+
+    def paginate_cursor(self, queryset, page_size=None):
+        size = page_size or self.paginate_by
+        ordering = self.get_cursor_ordering()
+        fields = None if ordering is None else self._ordering_fields(queryset, ordering)
+        direction, number, position = self._read_cursor(fields)
+        count = estimate_count(queryset) if self.cursor_count else None
+        if ordering is None:                                                    # positional pages, only for short result sets such as ranked searches
+            return self._paginate_positions(queryset, size, direction, number, position, count)
+        # the pages of the window beyond this one are read with it: only their first rows are needed, to
+        # tell whether they exist and to make their cursors
+        reach = size * (self.cursor_window - 1) + 1 if self.cursor_window else 0
+
+        def walk(reverse, values, limit):
+            ordered = queryset.order_by(*[('-' if descending != reverse else '') + name for name, field, descending in fields])
+            if values is not None:
+                ordered = ordered.filter(self._after(fields, values, reverse))
+            return list(ordered[:limit])
+
+        reverse = direction != 'n'
+        rows = walk(reverse, position, size + max(reach, 1))
+        more = len(rows) > size
+        rows, beyond = rows[:size], rows[size:]
+        if reverse:
+            rows.reverse()
+        # walking backwards, the rows behind the cursor are the "next" ones; walking forwards, the "previous" ones
+        has_previous = more if reverse else position is not None
+        has_next = position is not None if reverse else more
+        if not has_previous:
+            number = 1
+        elif number is None and count is not None:
+            number = max((count + size - 1) // size, 1)
+        keys = lambda row: [getattr(row, name) for name, field, descending in fields]
+        # and one more query for the window on the side the cursor came from
+        before, after = (beyond, []) if reverse else ([], beyond)
+        if rows and reach and number is not None:
+            if reverse and has_next:
+                after = walk(False, keys(rows[-1]), reach)
+            elif not reverse and has_previous:
+                before = walk(True, keys(rows[0]), reach)
+
+        def cursors(j):
+            if j < 0:
+                return ['p', number + j, keys(rows[0] if j == -1 else before[size * (-j - 1) - 1])]
+            return ['n', number + j, keys(rows[-1] if j == 1 else after[size * (j - 1) - 1])]
+        return CursorPage(
+            rows,
+            number,
+            self._query(['p', number - 1 if number else None, keys(rows[0])]) if has_previous and rows else None,
+            self._query(['n', number + 1 if number else None, keys(rows[-1])]) if has_next and rows else None,
+            self._query(None),
+            self._query(['p', None, None]),
+            count,
+            self._window(number, size, before, after, cursors) if rows else [],
+        )
+
+    def _paginate_positions(self, queryset, size, direction, number, offset, count):
+        offset = offset or 0
+        rows = list(queryset[offset:offset + size * max(self.cursor_window, 1) + 1])
+        return CursorPage(
+            rows[:size],
+            number,
+            self._query(['n', number - 1, max(offset - size, 0)]) if offset else None,
+            self._query(['n', number + 1, offset + size]) if len(rows) > size else None,
+            self._query(None),
+            None,
+            count,
+            self._window(number, size, range(offset), rows[size:], lambda j: ['n', number + j, max(offset + size * j, 0)]),
+        )
+
+    def paginate_queryset(self, queryset, page_size):                           # hooks the cursor page into ListView
+        page = self.paginate_cursor(queryset, page_size)
+        return (None, page, page.object_list, page.has_other_pages())
@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+
+Database = base.Database
+
+CHECK_AFTER = 30                                                                # seconds idle after which a pooled connection is tested before use
+
+
+# the connections of one process: at most `size` open, handed out most recently used first; a thread that
+# finds them all in use waits `timeout` seconds for one. psycopg2.pool is not used, its pools raise at once
+# when exhausted and close whatever comes back above their minimum
+class ConnectionPool:
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.idle = []                                                          # (connection, idle since)
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(size)
+
+    def get(self, connect):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise Database.OperationalError('no database connection came free in %ss, all %d are in use' % (self.timeout, self.size))
+        try:
+            while True:
+                with self.lock:
+                    connection, since = self.idle.pop() if self.idle else (None, None)
+                if connection is None:
+                    return connect()
+                if time.monotonic() - since < CHECK_AFTER or self._usable(connection):
+                    return connection
+                connection.close()                                              # dropped by the server, try the next one
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def put(self, connection):
+        try:
+            if connection.closed:
+                return
+            status = connection.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:                 # the server went away
+                connection.close()
+                return
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+            with self.lock:
+                self.idle.append((connection, time.monotonic()))
+        except Database.Error:
+            connection.close()
+        finally:
+            self.slots.release()
+
+    def _usable(self, connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except Database.Error:
+            return False
+        return True
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+# one pool per database and process: a pool made before gunicorn forks is not carried into the workers
+def get_pool(alias, settings_dict):
+    key = (alias, os.getpid())
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(settings_dict['POOL_SIZE'], settings_dict['POOL_TIMEOUT'])
+        return _pools[key]
+
+
+# the postgresql backend, but connecting takes a connection from the process' pool and closing gives it back
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        connect = lambda: super(DatabaseWrapper, self).get_new_connection(conn_params)
+        connection = get_pool(self.alias, self.settings_dict).get(connect)
+        self.isolation_level = self.settings_dict['OPTIONS'].get('isolation_level', connection.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            get_pool(self.alias, self.settings_dict).put(self.connection)
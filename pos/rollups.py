@@ -0,0 +1,195 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.apps import apps as global_apps
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .bulk import insert_rows
+from .models import DailyStockTotal, DailySupplierTotal, DailyTotal
+
+
+# daily rollups of the bills: posting a bill adds its lines to the rows of its day, deleting it subtracts
+# them again, so reports read one row per day and series instead of scanning the items;
+# rebuild_rollups recomputes a date range from the bills, for data written around the services
+
+
+def _values(model):
+    return [field.column for field in model._meta.concrete_fields if not field.primary_key]
+
+
+# adds the rows to the rollup with one multi-row INSERT ... ON CONFLICT DO UPDATE SET x = x + excluded.x (sqlite
+# >= 3.24, postgresql), so two postings on the same day cannot lose each other's counts as a read-modify-write
+# would; every column is written because the model defaults only exist on the python side. The rows have
+# distinct keys, they are totals per key
+def _increment(model, keys, rows):
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = _values(model)
+    adapt = connection.ops.adapt_datefield_value
+    insert_rows(
+        'INSERT INTO %s (%s) VALUES' % (table, ', '.join(quote(column) for column in columns)),
+        [[adapt(row[column]) if column == 'date' else row.get(column, 0) for column in columns] for row in rows],
+        'ON CONFLICT (%s) DO UPDATE SET %s' % (
+            ', '.join(quote(key) for key in keys),
+            ', '.join('%s = %s.%s + excluded.%s' % (quote(column), table, quote(column), quote(column)) for column in columns if column not in keys),
+        ),
+    )
+
+
+def _day(bill):
+    return timezone.localtime(bill.time).date()
+
+
+def _by_stock(items):
+    totals = defaultdict(lambda: [0, 0])
+    for item in items:
+        totals[item.stock_id][0] += item.quantity
+        totals[item.stock_id][1] += item.totalprice
+    return totals
+
+
+# (bills, quantity, amount) of the postings per key, the key being made of a bill's day and, with `by_stock`,
+# the stock of a line
+def _totals(postings, key, by_stock=False):
+    totals = defaultdict(lambda: [0, 0, 0])
+    for bill, items in postings:
+        day = _day(bill)
+        stocks = _by_stock(items)
+        if by_stock:
+            for pk, (quantity, amount) in stocks.items():
+                totals[key(bill, day, pk)][1] += quantity
+                totals[key(bill, day, pk)][2] += amount
+            continue
+        row = totals[key(bill, day, None)]
+        row[0] += 1
+        row[1] += sum(quantity for quantity, amount in stocks.values())
+        row[2] += sum(amount for quantity, amount in stocks.values())
+    return totals.items()
+
+
+# sale bills with their items, as (bill, items) pairs, into the rollups; a batch costs the same two statements
+# as a single bill. sign=-1 takes them back out when the bills are deleted
+def record_sales(postings, sign=1):
+    _increment(DailyStockTotal, ['stock_id', 'date'], [
+        {'stock_id': pk, 'date': day, 'sold_quantity': sign * quantity, 'sold_amount': sign * amount}
+        for (pk, day), (bills, quantity, amount) in _totals(postings, lambda bill, day, pk: (pk, day), by_stock=True)
+    ])
+    _increment(DailyTotal, ['date'], [
+        {'date': day, 'sale_bills': sign * bills, 'sale_quantity': sign * quantity, 'sale_amount': sign * amount}
+        for day, (bills, quantity, amount) in _totals(postings, lambda bill, day, pk: day)
+    ])
+
+
+def record_purchases(postings, sign=1):
+    _increment(DailyStockTotal, ['stock_id', 'date'], [
+        {'stock_id': pk, 'date': day, 'purchased_quantity': sign * quantity, 'purchased_amount': sign * amount}
+        for (pk, day), (bills, quantity, amount) in _totals(postings, lambda bill, day, pk: (pk, day), by_stock=True)
+    ])
+    _increment(DailySupplierTotal, ['supplier_id', 'date'], [
+        {'supplier_id': supplier, 'date': day, 'bills': sign * bills, 'quantity': sign * quantity, 'amount': sign * amount}
+        for (supplier, day), (bills, quantity, amount) in _totals(postings, lambda bill, day, pk: (bill.supplier_id, day))
+    ])
+    _increment(DailyTotal, ['date'], [
+        {'date': day, 'purchase_bills': sign * bills, 'purchase_quantity': sign * quantity, 'purchase_amount': sign * amount}
+        for day, (bills, quantity, amount) in _totals(postings, lambda bill, day, pk: day)
+    ])
+
+
+def record_sale(bill, items, sign=1):
+    record_sales([(bill, items)], sign)
+
+
+def record_purchase(bill, items, sign=1):
+    record_purchases([(bill, items)], sign)
+
+
+def _between(field, start, end):
+    # [start, end] local dates as filters on a datetime field, kept as a range so the time indexes apply
+    filters = {}
+    if start:
+        filters[field + '__gte'] = timezone.make_aware(datetime.combine(start, time.min))
+    if end:
+        filters[field + '__lt'] = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+    return filters
+
+
+def _grouped(queryset, time_field, start, end, keys, **totals):
+    return (queryset.filter(**_between(time_field, start, end)).annotate(day=TruncDate(time_field))
+            .order_by().values('day', *keys).annotate(**totals))
+
+
+# recomputes the rollups of the days from start to end (both included, None for open ended) from the bills;
+# `apps` lets the migration run it against the historical models
+def rebuild_rollups(start=None, end=None, apps=global_apps):
+    get_model = lambda name: apps.get_model('pos', name)
+    StockTotal, SupplierTotal, Total = get_model('DailyStockTotal'), get_model('DailySupplierTotal'), get_model('DailyTotal')
+    SaleBill, SaleItem = get_model('SaleBill'), get_model('SaleItem')
+    PurchaseBill, PurchaseItem = get_model('PurchaseBill'), get_model('PurchaseItem')
+
+    stocks, suppliers, totals = {}, {}, {}
+    stock_total = lambda day, pk: stocks.setdefault((day, pk), StockTotal(date=day, stock_id=pk))
+    supplier_total = lambda day, pk: suppliers.setdefault((day, pk), SupplierTotal(date=day, supplier_id=pk))
+    day_total = lambda day: totals.setdefault(day, Total(date=day))
+
+    with transaction.atomic():
+        for model in (StockTotal, SupplierTotal, Total):
+            days = model.objects.all()
+            if start:
+                days = days.filter(date__gte=start)
+            if end:
+                days = days.filter(date__lte=end)
+            days.delete()
+
+        items = dict(quantity=Sum('quantity'), amount=Sum('totalprice'))
+        for row in _grouped(SaleItem.objects, 'billno__time', start, end, ['stock'], **items):
+            total = stock_total(row['day'], row['stock'])
+            total.sold_quantity, total.sold_amount = row['quantity'], row['amount']
+            total = day_total(row['day'])
+            total.sale_quantity += row['quantity']
+            total.sale_amount += row['amount']
+        for row in _grouped(SaleBill.objects, 'time', start, end, [], bills=Count('billno')):
+            day_total(row['day']).sale_bills = row['bills']
+
+        for row in _grouped(PurchaseItem.objects, 'billno__time', start, end, ['stock'], **items):
+            total = stock_total(row['day'], row['stock'])
+            total.purchased_quantity, total.purchased_amount = row['quantity'], row['amount']
+            total = day_total(row['day'])
+            total.purchase_quantity += row['quantity']
+            total.purchase_amount += row['amount']
+        for row in _grouped(PurchaseItem.objects, 'billno__time', start, end, ['billno__supplier'], **items):
+            total = supplier_total(row['day'], row['billno__supplier'])
+            total.quantity, total.amount = row['quantity'], row['amount']
+        for row in _grouped(PurchaseBill.objects, 'time', start, end, ['supplier'], bills=Count('billno')):
+            supplier_total(row['day'], row['supplier']).bills = row['bills']
+            day_total(row['day']).purchase_bills += row['bills']
+
+        StockTotal.objects.bulk_create(stocks.values(), batch_size=1000)
+        SupplierTotal.objects.bulk_create(suppliers.values(), batch_size=1000)
+        Total.objects.bulk_create(totals.values(), batch_size=1000)
+    return len(totals)
+
+
+# the report figures, all read from the rollups
+
+def daily_totals(start, end):
+    # one entry per day of the range, days without bills included as zeros
+    rows = {total.date: total for total in DailyTotal.objects.filter(date__gte=start, date__lte=end)}
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    return [rows.get(day) or DailyTotal(date=day) for day in days]
+
+
+def top_stocks(start, end, limit):
+    return list(
+        DailyStockTotal.objects.filter(date__gte=start, date__lte=end).values('stock__name')
+        .annotate(quantity=Sum('sold_quantity'), amount=Sum('sold_amount')).filter(amount__gt=0).order_by('-amount')[:limit]
+    )
+
+
+def supplier_totals(start, end):
+    return list(
+        DailySupplierTotal.objects.filter(date__gte=start, date__lte=end).values('supplier__name')
+        .annotate(bills=Sum('bills'), quantity=Sum('quantity'), amount=Sum('amount')).filter(bills__gt=0).order_by('-amount')
+    )
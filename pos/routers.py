@@ -0,0 +1,72 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# the read-only pages (POS_REPLICA_VIEWS: dashboard, report, lists, bill pages, exports) read the pos tables
+# from the POS_DB_REPLICA database when DATABASES has one (DATABASE_REPLICA_URL), so month-end reporting and
+# browsing stay off the primary the checkout writes to. Sessions, users and every write stay on the primary.
+#
+# A session that writes is pinned to the primary for POS_REPLICA_PIN_SECONDS, by a cookie, so the pages it
+# opens next show what it just saved even while the replica is behind; the window must outlast the
+# replica's lag. Other sessions may see a change that much later.
+
+PIN_COOKIE = 'pos_primary'
+
+_state = ContextVar('pos_replica_state', default=None)
+
+
+# what ReplicaMiddleware knows of the request being served; the router marks it when something is written
+class RequestState:
+    def __init__(self, replica=False):
+        self.replica = replica
+        self.wrote = False
+
+
+def replica_configured():
+    return settings.POS_DB_REPLICA in connections.databases
+
+
+def is_pinned(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+# the pos reads inside it go to the replica, as for a background export
+@contextmanager
+def reading_replica():
+    token = _state.set(RequestState(replica=replica_configured()))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is not None and state.replica and model._meta.app_label == 'pos':
+            return settings.POS_DB_REPLICA
+        return None
+
+    # always the primary, even for a row read from the replica (Django would otherwise save it where it came from)
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, settings.POS_DB_REPLICA}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True                                                         # the same rows, one is a copy of the other
+        return None
+
+    # the replica gets its tables by replication
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != settings.POS_DB_REPLICA
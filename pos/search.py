@@ -0,0 +1,107 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from .models import Stock
+
+
+# ranked stock search over name, model and manufacturer
+#   sqlite     : an FTS5 table (pos_stock_fts) of the live stocks, kept in step by the receivers in signals.py
+#   postgresql : pg_trgm GIN indexes on UPPER() of each field, the expression of the icontains filter
+#   others     : a plain icontains scan
+
+FTS_TABLE = 'pos_stock_fts'
+SEARCH_FIELDS = ('name', 'model', 'manufacturer')
+
+
+def _fts_query(term):
+    # every word becomes a quoted prefix query, so 'sams gal' matches 'Samsung Galaxy';
+    # single letters (the 'M' of 'M-1200') match nearly everything and are dropped next to longer words
+    words = re.findall(r'\w+', term)
+    if any(len(word) > 1 for word in words):
+        words = [word for word in words if len(word) > 1]
+    return ' '.join('"%s"*' % word for word in words)
+
+
+def search_stocks(queryset, term):
+    term = term.strip()
+    if not term:
+        return queryset
+    if connection.vendor == 'sqlite':
+        match = _fts_query(term)
+        if not match:
+            return queryset.none()
+        # bm25 costs a few microseconds a row, too much for the thousands of matches of a short prefix, so only
+        # the newest POS_STOCK_SEARCH_CANDIDATES matches are ranked and listed: all of them for a term that
+        # narrows to fewer, a sample of a broader one until the next keystroke narrows it
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[
+                '%s.rowid = %s.id' % (FTS_TABLE, Stock._meta.db_table),
+                '%s MATCH %%s' % FTS_TABLE,
+                '%s.id IN (SELECT rowid FROM %s WHERE %s MATCH %%s ORDER BY rowid DESC LIMIT %%s)' % (Stock._meta.db_table, FTS_TABLE, FTS_TABLE),
+            ],
+            params=[match, match, settings.POS_STOCK_SEARCH_CANDIDATES],
+            select={'rank': '%s.rank' % FTS_TABLE},                             # bm25, lower is better
+            order_by=['rank', 'name'],
+        )
+    contains = Q()
+    for field in SEARCH_FIELDS:
+        contains |= Q(**{field + '__icontains': term})
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramSimilarity
+        from django.db.models.functions import Greatest
+        return queryset.filter(contains).annotate(
+            rank=Greatest(*[TrigramSimilarity(field, term) for field in SEARCH_FIELDS])
+        ).order_by('-rank', 'name')
+    return queryset.filter(contains).order_by('name')
+
+
+def index_stock(stock):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM %s WHERE rowid = %%s' % FTS_TABLE, [stock.pk])
+        if stock.is_deleted:
+            return
+        cursor.execute(
+            'INSERT INTO %s (rowid, name, model, manufacturer) VALUES (%%s, %%s, %%s, %%s)' % FTS_TABLE,
+            [stock.pk, stock.name, stock.model, stock.manufacturer],
+        )
+
+
+def unindex_stock(stock):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM %s WHERE rowid = %%s' % FTS_TABLE, [stock.pk])
+
+
+# re-indexes the given stocks, after a bulk write of part of the catalog that bypassed the model signals
+def index_stocks(pks):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for start in range(0, len(pks), 500):
+            chunk = pks[start:start + 500]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute('DELETE FROM %s WHERE rowid IN (%s)' % (FTS_TABLE, placeholders), chunk)
+            cursor.execute(
+                'INSERT INTO %s (rowid, name, model, manufacturer) SELECT id, name, model, manufacturer FROM %s WHERE NOT is_deleted AND id IN (%s)'
+                % (FTS_TABLE, Stock._meta.db_table, placeholders), chunk
+            )
+
+
+# rebuilds the whole index, needed after writes that bypass the model signals (bulk_create, raw sql)
+def rebuild_index():
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM %s' % FTS_TABLE)
+        cursor.execute(
+            'INSERT INTO %s (rowid, name, model, manufacturer) SELECT id, name, model, manufacturer FROM %s WHERE NOT is_deleted'
+            % (FTS_TABLE, Stock._meta.db_table)
+        )
+        cursor.execute("INSERT INTO %s (%s) VALUES ('optimize')" % (FTS_TABLE, FTS_TABLE))   # merges the index into one b-tree
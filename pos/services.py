@@ -0,0 +1,177 @@
+from collections import OrderedDict
+
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .dashboard import invalidate_dashboard
+from .jobs import enqueue_many
+from .models import Stock, StockMovement, PurchaseBillDetails, PurchaseItem, SaleBillDetails, SaleItem
+from .rollups import record_purchase, record_purchases, record_sale, record_sales
+from .versions import bump_version
+
+
+# raised when a sale asks for more units than are on hand
+class InsufficientStock(Exception):
+    def __init__(self, shortages, index=None):
+        self.shortages = shortages                                              # list of (stock name, available, requested)
+        self.index = index                                                      # the bill of a batch that ran short
+        super().__init__(", ".join(
+            "%s (only %d left, %d requested)" % shortage for shortage in shortages
+        ))
+
+
+def _merge_quantities(items):
+    # collapses the lines into one quantity per stock, so a stock listed twice is locked and updated once
+    quantities = OrderedDict()
+    for item in items:
+        quantities[item.stock_id] = quantities.get(item.stock_id, 0) + item.quantity
+    return quantities
+
+
+def _lock_stocks(stock_ids, **filters):
+    # locks the rows in primary key order so two postings touching the same stocks can never deadlock
+    return list(
+        Stock.objects.select_for_update().filter(pk__in=stock_ids, **filters).order_by('pk')
+    )
+
+
+def _apply_deltas(deltas, kind, billno):
+    # applies every quantity change of a bill with a single UPDATE and logs them in the ledger
+    _apply_movements([(billno, deltas)], kind)
+
+
+def _apply_movements(bills, kind):
+    # the quantity changes of (billno, {stock id: delta}) pairs: one UPDATE for all of them, one ledger insert
+    totals = {}
+    for billno, deltas in bills:
+        for pk, delta in deltas.items():
+            totals[pk] = totals.get(pk, 0) + delta
+    if not totals:
+        return
+    Stock.objects.filter(pk__in=totals).update(quantity=F('quantity') + Case(
+        *[When(pk=pk, then=Value(delta)) for pk, delta in totals.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    ))
+    now = timezone.now()
+    StockMovement.objects.bulk_create(
+        StockMovement(stock_id=pk, kind=kind, billno=billno, delta=delta, time=now) for billno, deltas in bills for pk, delta in deltas.items()
+    )
+
+
+def _save_bills(postings, details_model, item_model):
+    for bill, items in postings:
+        bill.total_price = 0
+        bill.item_count = 0
+        for item in items:
+            item.totalprice = item.perprice * item.quantity
+            bill.total_price += item.totalprice
+            bill.item_count += 1
+    # postgresql returns the numbers of the bills of one multi-row INSERT; sqlite does not (before Django 4),
+    # there each bill is its own INSERT
+    bills = [bill for bill, items in postings]
+    if connection.features.can_return_rows_from_bulk_insert:
+        type(bills[0]).objects.bulk_create(bills)
+    else:
+        for bill in bills:
+            bill.save()
+    details_model.objects.bulk_create(details_model(billno=bill) for bill in bills)
+    for bill, items in postings:
+        for item in items:
+            item.billno = bill
+    item_model.objects.bulk_create(item for bill, items in postings for item in items)
+
+
+# bulk inserts send no post_save, the pages and the dashboard are told here once the batch is committed
+def _bills_changed(version):
+    def changed():
+        bump_version(version)
+        bump_version('stock')
+        invalidate_dashboard()
+    transaction.on_commit(changed)
+
+
+# saves unsaved sale bills with their unsaved items, given as (bill, items) pairs, and takes the units out of
+# stock, all in one transaction with a fixed number of statements however many bills there are (but one
+# INSERT a bill on sqlite). If any stock would go below zero nothing is saved, and InsufficientStock names
+# the first bill that ran short
+def post_sales(postings):
+    with transaction.atomic():
+        bills = [(bill, _merge_quantities(items)) for bill, items in postings]
+        left = {stock.pk: stock for stock in _lock_stocks({pk for bill, quantities in bills for pk in quantities})}
+        available = {pk: stock.quantity for pk, stock in left.items()}
+        for index, (bill, quantities) in enumerate(bills):
+            shortages = [(left[pk].name, available[pk], quantity) for pk, quantity in quantities.items() if pk in left and available[pk] < quantity]
+            if shortages:
+                raise InsufficientStock(shortages, index)
+            for pk, quantity in quantities.items():
+                if pk in left:
+                    available[pk] -= quantity
+        _save_bills(postings, SaleBillDetails, SaleItem)
+        _apply_movements([(bill.billno, {pk: -quantity for pk, quantity in quantities.items()}) for bill, quantities in bills], StockMovement.SALE)
+        record_sales(postings)
+        enqueue_many('render_bill_pdf', [('sale', bill.billno) for bill, items in postings])   # committed with the bills, printed before anyone asks
+        _bills_changed('pos.salebill')
+    return [bill for bill, items in postings]
+
+
+# saves an unsaved sale bill with its unsaved items and takes the units out of stock,
+# raising InsufficientStock (with nothing saved) if any stock would go below zero
+def post_sale(bill, items):
+    return post_sales([(bill, items)])[0]
+
+
+# saves unsaved purchase bills with their unsaved items, as (bill, items) pairs, and adds the units to stock
+def post_purchases(postings):
+    with transaction.atomic():
+        bills = [(bill, _merge_quantities(items)) for bill, items in postings]
+        _lock_stocks({pk for bill, quantities in bills for pk in quantities})
+        _save_bills(postings, PurchaseBillDetails, PurchaseItem)
+        _apply_movements([(bill.billno, quantities) for bill, quantities in bills], StockMovement.PURCHASE)
+        record_purchases(postings)
+        enqueue_many('render_bill_pdf', [('purchase', bill.billno) for bill, items in postings])
+        _bills_changed('pos.purchasebill')
+    return [bill for bill, items in postings]
+
+
+# saves an unsaved purchase bill with its unsaved items and adds the units to stock
+def post_purchase(bill, items):
+    return post_purchases([(bill, items)])[0]
+
+
+def _reverse_bill(bill, item_model, sign, kind, record):
+    # undoes the stock changes of a bill before it is deleted, skipping stocks that have since been deleted;
+    # the rollups lose the whole bill, deleted stocks included
+    with transaction.atomic():
+        items = list(item_model.objects.filter(billno=bill).only('stock', 'quantity', 'totalprice'))
+        quantities = _merge_quantities(items)
+        live = _lock_stocks(quantities, is_deleted=False)
+        _apply_deltas({stock.pk: sign * quantities[stock.pk] for stock in live}, kind, bill.billno)
+        record(bill, items, -1)
+        bill.delete()
+
+
+# puts the units of a sale bill back into stock and deletes the bill
+def reverse_sale(bill):
+    _reverse_bill(bill, SaleItem, 1, StockMovement.SALE_REVERSAL, record_sale)
+
+
+# takes the units of a purchase bill back out of stock and deletes the bill
+def reverse_purchase(bill):
+    _reverse_bill(bill, PurchaseItem, -1, StockMovement.PURCHASE_REVERSAL, record_purchase)
+
+
+# saves a stock from the inventory forms, logging its opening quantity or a hand-edited change as a movement
+def save_stock(stock):
+    with transaction.atomic():
+        if stock.pk is None:
+            stock.save()
+            kind, delta = StockMovement.OPENING, stock.quantity
+        else:
+            previous = Stock.objects.select_for_update().values_list('quantity', flat=True).get(pk=stock.pk)
+            stock.save()
+            kind, delta = StockMovement.ADJUSTMENT, stock.quantity - previous
+        if delta:
+            StockMovement.objects.create(stock=stock, kind=kind, delta=delta)
+    return stock
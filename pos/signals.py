@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import metrics
+from .bills import invalidate_bill_pdf
+from .database import SQLITE_PRAGMAS
+from .dashboard import invalidate_dashboard
+from .jobs import enqueue
+from .models import Employee, PurchaseBill, PurchaseBillDetails, SaleBill, SaleBillDetails, Stock, Supplier
+from .search import index_stock, unindex_stock
+from .versions import bump_version
+
+
+# drops the cached dashboard once the change is committed, so no request can re-cache the old figures
+@receiver(post_save, sender=SaleBill)
+@receiver(post_delete, sender=SaleBill)
+@receiver(post_save, sender=PurchaseBill)
+@receiver(post_delete, sender=PurchaseBill)
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+@receiver(post_save, sender=Supplier)
+def dashboard_changed(sender, **kwargs):
+    transaction.on_commit(invalidate_dashboard)
+
+
+# the pages of each model are versioned on it (versions.versioned); a bill's details are part of its page
+VERSIONED = {
+    SaleBill: 'pos.salebill', SaleBillDetails: 'pos.salebill', PurchaseBill: 'pos.purchasebill', PurchaseBillDetails: 'pos.purchasebill',
+    Stock: 'pos.stock', Supplier: 'pos.supplier', Employee: 'pos.employee',
+}
+
+
+def model_changed(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(VERSIONED[sender]))
+
+
+# connected per model: a post_delete receiver for every sender would turn off the collector's fast deletes
+for model in VERSIONED:
+    post_save.connect(model_changed, sender=model)
+    post_delete.connect(model_changed, sender=model)
+
+
+# stock quantities move with every bill, so the stock lookup responses are versioned on both
+@receiver(post_save, sender=SaleBill)
+@receiver(post_delete, sender=SaleBill)
+@receiver(post_save, sender=PurchaseBill)
+@receiver(post_delete, sender=PurchaseBill)
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def stock_changed(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version('stock'))
+
+
+# keeps the stock search index in step with the catalog
+@receiver(post_save, sender=Stock)
+def stock_saved(sender, instance, **kwargs):
+    index_stock(instance)
+
+
+@receiver(post_delete, sender=Stock)
+def stock_deleted(sender, instance, **kwargs):
+    unindex_stock(instance)
+
+
+# a printed bill goes stale when its details are edited, and its number can be reused once it is deleted
+BILL_KINDS = {SaleBill: 'sale', SaleBillDetails: 'sale', PurchaseBill: 'purchase', PurchaseBillDetails: 'purchase'}
+
+
+@receiver(post_save, sender=SaleBillDetails)
+@receiver(post_save, sender=PurchaseBillDetails)
+def bill_details_saved(sender, instance, created, **kwargs):
+    if not created:                                                             # a new bill has not been printed yet
+        transaction.on_commit(lambda: invalidate_bill_pdf(BILL_KINDS[sender], instance.billno_id))
+
+
+@receiver(post_delete, sender=SaleBill)
+@receiver(post_delete, sender=PurchaseBill)
+def bill_deleted(sender, instance, **kwargs):
+    billno = instance.billno
+    transaction.on_commit(lambda: invalidate_bill_pdf(BILL_KINDS[sender], billno))
+
+
+# a photo without thumbnails gets them from the worker; the job is committed with the photo
+@receiver(post_save, sender=Supplier)
+@receiver(post_save, sender=Employee)
+def photo_saved(sender, instance, **kwargs):
+    if instance.photo_main and not instance.photo_hash:
+        enqueue('make_thumbnails', sender.__name__, instance.pk)
+
+
+# every connection reports its queries to the sampled request, whichever thread it belongs to
+@receiver(connection_created)
+def add_query_recorder(sender, connection, **kwargs):
+    if metrics.record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(metrics.record_query)
+
+
+# SQLite files are switched to WAL and synchronous=NORMAL as they are opened, see pos/database.py
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite' and not connection.is_in_memory_db():
+        with connection.cursor() as cursor:
+            for pragma in SQLITE_PRAGMAS:
+                cursor.execute(pragma)
+
+
+# a connection kept from an earlier request is tested before this one uses it; one the server has dropped is
+# closed, and the request opens a new one instead of failing on it
+@receiver(request_started)
+def check_connections(sender, **kwargs):
+    if not settings.POS_DB_HEALTH_CHECKS:
+        return
+    for conn in connections.all():
+        if conn.connection is not None and not conn.in_atomic_block and not conn.is_usable():
+            conn.close()
@@ -0,0 +1,35 @@
+// fills the stock <select> of a bill row with the matches for the search box above it,
+// using the json stock lookup so the page never has to ship the whole catalog
+(function () {
+    var timers = new WeakMap();
+
+    function fillOptions(select, stocks) {
+        var current = select.value;
+        select.options.length = 1;                                  // keeps the empty '---------' choice
+        stocks.forEach(function (stock) {
+            var option = new Option(stock.name + ' (' + stock.model + ') - ' + stock.quantity + ' in stock', stock.id);
+            select.add(option);
+        });
+        select.value = current;
+        if (!select.value && stocks.length) {
+            select.value = stocks[0].id;
+        }
+    }
+
+    function lookup(input) {
+        var select = input.parentNode.querySelector('select.stock');
+        var url = select.getAttribute('data-lookup-url') + '?q=' + encodeURIComponent(input.value);
+        fetch(url, {credentials: 'same-origin'})
+            .then(function (response) { return response.json(); })
+            .then(function (data) { fillOptions(select, data.results); });
+    }
+
+    document.addEventListener('input', function (event) {
+        var input = event.target;
+        if (!input.classList || !input.classList.contains('stock-search')) {
+            return;
+        }
+        clearTimeout(timers.get(input));
+        timers.set(input, setTimeout(function () { lookup(input); }, 200));
+    });
+})();
@@ -0,0 +1,54 @@
+from datetime import date
+
+from django.core.exceptions import ObjectDoesNotExist
+
+from .bills import bill_pdf
+from .exports import attendance_rows, export_file, purchase_rows, sale_rows, stock_rows
+from .forms import AttendanceExportForm, ExportForm, PurchaseExportForm, StockExportForm
+from .jobs import task
+from .rollups import rebuild_rollups
+from .routers import reading_replica
+from .thumbnails import update_thumbnails
+
+
+# the work the web process hands to `manage.py runworker`; registered when the app loads (apps.py)
+
+EXPORTS = {
+    'sales'         : (ExportForm, sale_rows),
+    'purchases'     : (PurchaseExportForm, purchase_rows),
+    'inventory'     : (StockExportForm, stock_rows),
+    'attendance'    : (AttendanceExportForm, attendance_rows),
+}
+
+
+# prints a freshly posted bill ahead of time, so the first print is a file read
+@task(queue='pdf')
+def render_bill_pdf(kind, billno):
+    try:
+        return bill_pdf(kind, billno)
+    except ObjectDoesNotExist:                                                  # deleted before its turn came
+        return None
+
+
+# `params` is the export view's query string, validated there already
+@task(queue='exports', max_attempts=1, timeout=3600)
+def export(name, params):
+    form_class, rows = EXPORTS[name]
+    form = form_class(params)
+    if not form.is_valid():
+        raise ValueError(form.errors.as_text())
+    filters = dict(form.cleaned_data)
+    fmt = filters.pop('format')
+    with reading_replica():
+        return export_file(rows(**filters), name, fmt)
+
+
+@task(name='rebuild_rollups', timeout=3600)
+def rebuild_rollups_task(start=None, end=None):
+    return rebuild_rollups(start and date.fromisoformat(start), end and date.fromisoformat(end))
+
+
+# `model` is 'Supplier' or 'Employee'
+@task(name='make_thumbnails', queue='images')
+def make_thumbnails_task(model, pk):
+    return update_thumbnails(model, pk)
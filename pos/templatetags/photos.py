@@ -0,0 +1,18 @@
+from django import template
+
+from pos.thumbnails import thumbnail_urls
+
+
+register = template.Library()
+
+
+# {% photo supplier 150 %}: the person's photo as a `size` pixels square, from the thumbnail set when it is
+# made (WebP where the browser takes it, the width the screen needs), from the upload until then
+@register.inclusion_tag('photo.html')
+def photo(person, size, css_class='rounded-circle shadow'):
+    context = {'person': person, 'size': size, 'css_class': css_class}
+    if person.photo_hash:
+        urls = thumbnail_urls(person.photo_hash)
+        context['srcsets'] = {ext: ', '.join('%s %dw' % (url, width) for width, url in sizes) for ext, sizes in urls.items()}
+        context['src'] = next((url for width, url in urls['jpg'] if width >= size), urls['jpg'][-1][1])
+    return context
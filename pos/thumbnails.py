@@ -0,0 +1,95 @@
+import hashlib
+import io
+import re
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .versions import bump_version
+
+
+# profile photos are shown from small square thumbnails instead of the multi-MB uploads. After an upload (and
+# from the make_thumbnails command for older photos) a job of the 'images' queue turns the photo upright, drops
+# its EXIF data (camera, GPS position) and cuts it to POS_THUMBNAIL_SIZES squares in WebP and JPEG. Thumbnails
+# are named by a hash of the photo, so a url never changes content and is served with far-future cache headers
+# (views.thumbnail); a person's photo_hash only points at a set once all of it is written.
+
+VERSION = 1                                                                     # part of the hash, bump it when the output changes
+FORMATS = {
+    'webp'  : ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg'   : ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+NAME = re.compile(r'^[0-9a-f]{16}-\d+\.(?:%s)$' % '|'.join(FORMATS))
+
+
+def thumbnail_name(digest, size, ext):
+    return 'thumbs/%s-%d.%s' % (digest, size, ext)
+
+
+# {'webp': [(size, url), ...], 'jpg': [...]} of a photo's thumbnails, smallest first
+def thumbnail_urls(digest):
+    return {
+        ext: [(size, reverse('thumbnail', args=['%s-%d.%s' % (digest, size, ext)])) for size in sorted(settings.POS_THUMBNAIL_SIZES)]
+        for ext in FORMATS
+    }
+
+
+def _encode(image, fmt, options):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+# rewrites the upload without its metadata when it carries EXIF; the pixels are kept, turned upright
+def _strip_exif(field_file, image, data):
+    if not image.getexif():
+        return image, data
+    upright = ImageOps.exif_transpose(image)
+    fmt = image.format if image.format in ('JPEG', 'PNG', 'WEBP') else 'PNG'
+    options = {'quality': 95} if fmt in ('JPEG', 'WEBP') else {}
+    data = _encode(upright.convert('RGB') if fmt == 'JPEG' else upright, fmt, options)
+    with default_storage.open(field_file.name, 'wb') as f:                      # same name, the model row does not change
+        f.write(data)
+    return upright, data
+
+
+# makes the thumbnails of one photo and returns their digest
+def process_photo(field_file):
+    with default_storage.open(field_file.name, 'rb') as f:
+        data = f.read()
+    image = Image.open(io.BytesIO(data))
+    if not image.getexif():                                                     # kept as it is, so a JPEG is decoded at 1/2 to 1/8 scale only
+        largest = max(settings.POS_THUMBNAIL_SIZES)
+        image.draft('RGB', (largest, largest))
+    image.load()
+    image, data = _strip_exif(field_file, image, data)
+    digest = hashlib.sha256(b'%d:' % VERSION + data).hexdigest()[:16]
+    image = image.convert('RGBA') if image.mode in ('P', 'LA') else image
+    for size in settings.POS_THUMBNAIL_SIZES:
+        square = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        for ext, (fmt, options) in FORMATS.items():
+            name = thumbnail_name(digest, size, ext)
+            if default_storage.exists(name):                                    # the same photo uploaded again
+                continue
+            flat = square.convert('RGB') if fmt == 'JPEG' else square
+            default_storage.save(name, ContentFile(_encode(flat, fmt, options)))
+    return digest
+
+
+# the thumbnails of a supplier's or employee's current photo; a photo replaced in the meantime is left to its own job
+def update_thumbnails(model, pk):
+    model = apps.get_model('pos', model)
+    person = model.objects.filter(pk=pk).only('photo_main').first()
+    if person is None or not person.photo_main:
+        return None
+    try:
+        digest = process_photo(person.photo_main)
+    except (FileNotFoundError, UnidentifiedImageError):                         # nothing a retry would fix
+        return None
+    if model.objects.filter(pk=pk, photo_main=person.photo_main.name).update(photo_hash=digest):
+        bump_version(model._meta.label_lower)                                   # the pages showing the photo
+    return digest
@@ -0,0 +1,75 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+
+# version counters kept in the cache, bumped whenever the data behind a cached response changes;
+# responses key their cache entries and etags on them instead of asking the database what changed
+
+KEY = 'pos:version:%s'
+RESPONSE_KEY = 'pos:response:%s'
+
+
+def get_version(name):
+    version = cache.get(KEY % name)
+    if version is None:
+        cache.add(KEY % name, 1, None)                                          # never expires, add() keeps a concurrent bump
+        version = cache.get(KEY % name, 1)
+    return version
+
+
+def bump_version(name):
+    try:
+        cache.incr(KEY % name)
+    except ValueError:                                                          # not set yet or evicted
+        cache.add(KEY % name, 1, None)
+
+
+# a page rendered for one session shows its user and carries its csrf token, so the etag covers both cookies
+def _etag(request, names):
+    key = '%s|%s|%s|%s' % (
+        request.get_full_path(), ','.join('%s=%s' % (name, get_version(name)) for name in names),
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME, ''), request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+    )
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+# makes a GET view conditional on the versions of the data it shows: the etag comes from the counters
+# alone, so a revalidation the data has not moved past is answered with a 304 before the view
+# (or the session, or the ORM) runs. With POS_RESPONSE_CACHE_TIMEOUT the rendered page is also kept in the
+# cache under the same key, for the same session and versions. A request with flash messages waiting is
+# always rendered, a 304 would drop them.
+def versioned(*names):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or len(get_messages(request)):
+                return view(request, *args, **kwargs)
+            digest = _etag(request, names)
+            etag = '"%s"' % digest
+            # no Last-Modified: a timestamp neither tells sessions apart nor two changes in the same second
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                cached = cache.get(RESPONSE_KEY % digest) if settings.POS_RESPONSE_CACHE_TIMEOUT else None
+                if cached is not None:
+                    response = HttpResponse(cached['content'], content_type=cached['content_type'])
+                else:
+                    response = view(request, *args, **kwargs)
+                    if response.status_code != 200:
+                        return response
+                    if settings.POS_RESPONSE_CACHE_TIMEOUT and not response.streaming and not response.cookies:
+                        if hasattr(response, 'render'):
+                            response.render()                                   # a list view's TemplateResponse
+                        cache.set(RESPONSE_KEY % digest, {'content': response.content, 'content_type': response['Content-Type']},
+                                  settings.POS_RESPONSE_CACHE_TIMEOUT)
+            response['ETag'] = etag
+            patch_cache_control(response, private=True, no_cache=True)          # revalidated every time, the 304 is the cheap part
+            patch_vary_headers(response, ['Cookie'])
+            return response
+        return wrapper
+    return decorator
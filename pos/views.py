@@ -1,4 +1,15 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.files.storage import default_storage
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_POST
 from django.contrib.auth.forms import UserCreationForm,AuthenticationForm
 from django.db import IntegrityError
 from django.contrib.auth import login, logout, authenticate
@@ -16,11 +27,29 @@ from django.views.generic import (
 )
 from .models import *
 from .forms import *
+from .api import ApiError, submit
+from .attendance import mark_attendance, monthly_summary, statuses_on
+from .bills import bill_pdf
+from .concurrency import async_view, in_thread
+from .dashboard import aget_dashboard_metrics
+from .exports import attendance_rows, export_response, purchase_rows, sale_rows, stock_rows
 from .filters import StockFilter
+from .imports import import_stocks
+from .jobs import enqueue, job_result
+from .metrics import render_metrics
+from .pagination import CursorPaginationMixin
+from .rollups import daily_totals, supplier_totals, top_stocks
+from .search import search_stocks
+from .versions import get_version, versioned
+from .thumbnails import NAME as THUMBNAIL_NAME
+from .services import InsufficientStock, post_purchase, post_sale, reverse_purchase, reverse_sale
 from django_filters.views import FilterView
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from datetime import datetime,date
-from django.db.models import Sum
+import csv
+import hashlib
+import io
+import os
+from django.db.models import Prefetch, Sum
 
 
 
@@ -42,28 +71,19 @@ def login(request):
        return render(request, 'login.html')
 
 
-def dashboard(request):
-        labels = []
-        data = []
-        stockqueryset = Stock.objects.filter(is_deleted=False).order_by('-quantity')
-        for item in stockqueryset:
-            labels.append(item.name)
-            data.append(item.quantity)
-        sales = SaleBill.objects.order_by('-time')[:3]
-        purchases = PurchaseBill.objects.order_by('-time')[:3]
-        total_sales = SaleBillDetails.objects.aggregate(Sum('total'))
-        today_customers = SaleBill.objects.filter(time__gte = datetime.now().replace(hour=0,minute=0,second=0)).count()
-        today_purchases = PurchaseBill.objects.filter(time__gte = datetime.now().replace(hour=0,minute=0,second=0)).count()
-        context = {
-            'labels'    : labels,
-            'data'      : data,
-            'sales'     : sales,
-            'purchases' : purchases,
-            'total_sales' : total_sales,
-            'today_customers' : today_customers,
-            'today_purchases': today_purchases,
-        }
-        return render(request,'index.html', context)
+# async: under ASGI its queries run side by side on the thread pool, see pos/concurrency.py
+async def dashboard(request):
+        context = await aget_dashboard_metrics(request)                         # cached, recomputed only after a bill or stock changes
+        return await in_thread(request, render, request, 'index.html', context)
+
+
+# per-view request metrics of this process in the prometheus text format, for the scraper, which sends
+# "Authorization: Bearer <POS_METRICS_TOKEN>"; without a token set there is no endpoint
+def metrics(request):
+    token = settings.POS_METRICS_TOKEN
+    if not token or not constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), 'Bearer ' + token):
+        raise Http404
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 
@@ -88,11 +108,52 @@ class StockCreateView(SuccessMessageMixin, CreateView):
         context["savebtn"] = 'Add to Inventory'
         return context
 
-class StockListView(FilterView):
+@method_decorator(versioned('stock'), name='get')
+class StockListView(CursorPaginationMixin, FilterView):
     filterset_class = StockFilter
     queryset = Stock.objects.filter(is_deleted=False)
     template_name = 'inventory.html'
     paginate_by = 10
+    cursor_ordering = ('id',)
+
+    def get_cursor_ordering(self):
+        if self.filterset.form.is_valid() and self.filterset.form.cleaned_data.get('name'):
+            return None                                                         # search results keep their rank order and are capped, so they page by position
+        return self.cursor_ordering
+
+
+def _stock_lookup_params(request):
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    return request.GET.get('q', '').strip(), page
+
+
+# the etag only depends on the stock version and the query, so a repeated lookup is answered with a 304 without touching the db
+def stock_lookup_etag(request):
+    query, page = _stock_lookup_params(request)
+    return hashlib.md5(('%s:%s:%s' % (get_version('stock'), query, page)).encode()).hexdigest()
+
+
+# paginated json stock lookup behind the stock autocomplete on the sale and purchase screens
+@async_view
+@condition(etag_func=stock_lookup_etag)
+def stock_search(request):
+    key = 'pos:stock-lookup:%s' % stock_lookup_etag(request)
+    data = cache.get(key)
+    if data is None:
+        query, page = _stock_lookup_params(request)
+        size = settings.POS_STOCK_LOOKUP_PAGE_SIZE
+        stocks = search_stocks(Stock.objects.filter(is_deleted=False), query)
+        if not query:
+            stocks = stocks.order_by('name')
+        rows = list(stocks.values('id', 'name', 'model', 'quantity')[(page - 1) * size:page * size + 1])     # one extra row tells if there is a next page
+        data = {'results': rows[:size], 'page': page, 'has_next': len(rows) > size}
+        cache.set(key, data, settings.POS_STOCK_LOOKUP_CACHE_TIMEOUT)
+    response = JsonResponse(data)
+    patch_cache_control(response, private=True, no_cache=True)                  # browsers revalidate with the etag instead of reusing stale quantities
+    return response
 
 
 class StockUpdateView(SuccessMessageMixin, UpdateView):                                 # updateview class to edit stock, mixin used to display message
@@ -126,6 +187,36 @@ class StockDeleteView(View):
         return redirect('inventory')
 
 
+# bulk create/update of stocks from a csv file, the same import as the import_stock command
+class StockImportView(View):
+    template_name = "import_stock.html"
+    shown_errors = 100                                                          # the rest are counted, not listed
+
+    def get(self, request):
+        return render(request, self.template_name, {'form': StockImportForm()})
+
+    def post(self, request):
+        form = StockImportForm(request.POST, request.FILES)
+        if not form.is_valid():
+            return render(request, self.template_name, {'form': form})
+        stream = io.TextIOWrapper(form.cleaned_data['file'], encoding='utf-8-sig', newline='')
+        try:
+            result = import_stocks(stream)
+        except UnicodeDecodeError:
+            form.add_error('file', 'The file is not UTF-8 encoded text.')
+            return render(request, self.template_name, {'form': form})
+        except csv.Error as error:                                              # a field over the csv module's size limit, say
+            form.add_error('file', 'The file is not valid CSV: %s.' % error)
+            return render(request, self.template_name, {'form': form})
+        if result.created or result.updated:
+            messages.success(request, "%d stock(s) created, %d updated" % (result.created, result.updated))
+        return render(request, self.template_name, {
+            'form': StockImportForm(),
+            'result': result,
+            'errors': result.errors[:self.shown_errors],
+        })
+
+
 # used to add a new supplier
 class SupplierCreateView(SuccessMessageMixin, CreateView):
     model = Supplier
@@ -142,11 +233,13 @@ class SupplierCreateView(SuccessMessageMixin, CreateView):
 
 
 # shows a lists of all suppliers
-class SupplierListView(ListView):
+@method_decorator(versioned('pos.supplier'), name='get')
+class SupplierListView(CursorPaginationMixin, ListView):
     model = Supplier
     template_name = "suppliers_list.html"
     queryset = Supplier.objects.filter(is_deleted=False)
     paginate_by = 10
+    cursor_ordering = ('id',)
 
 
 # used to update a supplier's info
@@ -183,21 +276,20 @@ class SupplierDeleteView(View):
 
 
 # used to view a supplier's profile
-class SupplierView(View):
+@method_decorator(versioned('pos.supplier', 'pos.purchasebill', 'pos.stock'), name='get')
+class SupplierView(CursorPaginationMixin, View):
+    cursor_ordering = ('-time', '-billno')
+
     def get(self, request, name):
         supplierobj = get_object_or_404(Supplier, name=name)
-        bill_list = PurchaseBill.objects.filter(supplier=supplierobj)
-        page = request.GET.get('page', 1)
-        paginator = Paginator(bill_list, 10)
-        try:
-            bills = paginator.page(page)
-        except PageNotAnInteger:
-            bills = paginator.page(1)
-        except EmptyPage:
-            bills = paginator.page(paginator.num_pages)
+        bill_list = PurchaseBill.objects.filter(supplier=supplierobj).prefetch_related(
+            Prefetch('purchasebillno', queryset=PurchaseItem.objects.select_related('stock'), to_attr='items'))
+        bills = self.paginate_cursor(bill_list)                                 # newest first, one page after the other without OFFSET
         context = {
-            'supplier'  : supplierobj,
-            'bills'     : bills
+            'supplier'      : supplierobj,
+            'bills'         : bills,
+            'page_obj'      : bills,
+            'is_paginated'  : bills.has_other_pages(),
         }
         return render(request, 'supplier.html', context)
 
@@ -237,25 +329,10 @@ class PurchaseCreateView(View):
         formset = PurchaseItemFormset(request.POST)                             # recieves a post method for the formset
         supplierobj = get_object_or_404(Supplier, pk=pk)                        # gets the supplier object
         if formset.is_valid():
-            # saves bill
             billobj = PurchaseBill(supplier=supplierobj)                        # a new object of class 'PurchaseBill' is created with supplier field set to 'supplierobj'
-            billobj.save()                                                      # saves object into the db
-            # create bill details object
-            billdetailsobj = PurchaseBillDetails(billno=billobj)
-            billdetailsobj.save()
-            for form in formset:                                                # for loop to save each individual form as its own object
-                # false saves the item and links bill to the item
-                billitem = form.save(commit=False)
-                billitem.billno = billobj                                       # links the bill object to the items
-                # gets the stock item
-                stock = get_object_or_404(Stock, name=billitem.stock.name)       # gets the item
-                # calculates the total price
-                billitem.totalprice = billitem.perprice * billitem.quantity
-                # updates quantity in stock db
-                stock.quantity += billitem.quantity                              # updates quantity
-                # saves bill item and stock
-                stock.save()
-                billitem.save()
+            billitems = [form.save(commit=False) for form in formset]          # false builds the items without saving them
+            # saves the bill, its details and items and adds the quantities to stock in one transaction
+            post_purchase(billobj, billitems)
             messages.success(request, "Purchased items have been registered successfully")
             return redirect('purchase-bill', billno=billobj.billno)
         formset = PurchaseItemFormset(request.GET or None)
@@ -267,6 +344,7 @@ class PurchaseCreateView(View):
 
 
 # used to display the purchase bill object
+@method_decorator(versioned('pos.purchasebill', 'pos.supplier', 'pos.stock'), name='get')
 class PurchaseBillView(View):
     model = PurchaseBill
     template_name = "purchase_bill.html"
@@ -316,34 +394,34 @@ class PurchaseDeleteView(SuccessMessageMixin, DeleteView):
 
      def delete(self, *args, **kwargs):
          self.object = self.get_object()
-         items = PurchaseItem.objects.filter(billno=self.object.billno)
-         for item in items:
-             stock = get_object_or_404(Stock, name=item.stock.name)
-             if stock.is_deleted == False:
-                 stock.quantity -= item.quantity
-                 stock.save()
+         reverse_purchase(self.object)                                          # takes the items back out of stock and deletes the bill
          messages.success(self.request, "Purchase bill has been deleted successfully")
-         return super(PurchaseDeleteView, self).delete(*args, **kwargs)
-         return redirect('suppliers-list')
+         return redirect(self.get_success_url())
 
 
 # shows the list of bills of all purchases
-class PurchaseView(ListView):
+@method_decorator(versioned('pos.purchasebill', 'pos.supplier', 'pos.stock'), name='get')
+class PurchaseView(CursorPaginationMixin, ListView):
      model = PurchaseBill
+     queryset = PurchaseBill.objects.select_related('supplier').prefetch_related(
+         Prefetch('purchasebillno', queryset=PurchaseItem.objects.select_related('stock'), to_attr='items'))    # items and their stock in one query for the whole page
      template_name = "purchases_list.html"
      context_object_name = 'bills'
-     ordering = ['-time']
+     cursor_ordering = ('-time', '-billno')
      paginate_by = 10
 
 
 
 
 # shows the list of bills of all sales
-class SaleView(ListView):
+@method_decorator(versioned('pos.salebill', 'pos.stock'), name='get')
+class SaleView(CursorPaginationMixin, ListView):
     model = SaleBill
+    queryset = SaleBill.objects.prefetch_related(
+        Prefetch('salebillno', queryset=SaleItem.objects.select_related('stock'), to_attr='items'))           # items and their stock in one query for the whole page
     template_name = "sales_list.html"
     context_object_name = 'bills'
-    ordering = ['-time']
+    cursor_ordering = ('-time', '-billno')
     paginate_by = 10
 
 
@@ -354,11 +432,9 @@ class SaleCreateView(View):
     def get(self, request):
         form = SaleForm(request.GET or None)
         formset = SaleItemFormset(request.GET or None)                          # renders an empty formset
-        stocks = Stock.objects.filter(is_deleted=False)
         context = {
             'form'      : form,
             'formset'   : formset,
-            'stocks'    : stocks
         }
         return render(request, self.template_name, context)
 
@@ -366,25 +442,18 @@ class SaleCreateView(View):
         form = SaleForm(request.POST)
         formset = SaleItemFormset(request.POST)                                 # recieves a post method for the formset
         if form.is_valid() and formset.is_valid():
-            # saves bill
             billobj = form.save(commit=False)
-            billobj.save()
-            # create bill details object
-            billdetailsobj = SaleBillDetails(billno=billobj)
-            billdetailsobj.save()
-            for form in formset:                                                # for loop to save each individual form as its own object
-                # false saves the item and links bill to the item
-                billitem = form.save(commit=False)
-                billitem.billno = billobj                                       # links the bill object to the items
-                # gets the stock item
-                stock = get_object_or_404(Stock, name=billitem.stock.name)
-                # calculates the total price
-                billitem.totalprice = billitem.perprice * billitem.quantity
-                # updates quantity in stock db
-                stock.quantity -= billitem.quantity
-                # saves bill item and stock
-                stock.save()
-                billitem.save()
+            billitems = [itemform.save(commit=False) for itemform in formset]  # false builds the items without saving them
+            # saves the bill, its details and items and takes the quantities out of stock in one transaction
+            try:
+                post_sale(billobj, billitems)
+            except InsufficientStock as error:
+                messages.error(request, "Not enough stock: %s" % error)
+                context = {
+                    'form'      : form,
+                    'formset'   : formset,
+                }
+                return render(request, self.template_name, context)
             messages.success(request, "Sold items have been registered successfully")
             return redirect('sale-bill', billno=billobj.billno)
         form = SaleForm(request.GET or None)
@@ -404,20 +473,16 @@ class SaleDeleteView(SuccessMessageMixin, DeleteView):
 
     def delete(self, *args, **kwargs):
         self.object = self.get_object()
-        items = SaleItem.objects.filter(billno=self.object.billno)
-        for item in items:
-            stock = get_object_or_404(Stock, name=item.stock.name)
-            if stock.is_deleted == False:
-                stock.quantity += item.quantity
-                stock.save()
+        reverse_sale(self.object)                                               # puts the items back into stock and deletes the bill
         messages.success(self.request, "Sale bill has been deleted successfully")
-        return super(SaleDeleteView, self).delete(*args, **kwargs)
+        return redirect(self.get_success_url())
 
 
 
 
 
 # used to display the sale bill object
+@method_decorator(versioned('pos.salebill', 'pos.stock'), name='get')
 class SaleBillView(View):
     model = SaleBill
     template_name = "sale_bill.html"
@@ -454,6 +519,165 @@ class SaleBillView(View):
         }
         return render(request, self.template_name, context)
 
+# the printable pdf of a bill, rendered once per version of the bill and then sent straight from disk
+def _bill_pdf(request, kind, billno):
+    try:
+        path = bill_pdf(kind, billno)
+    except ObjectDoesNotExist:
+        raise Http404("No such bill")
+    name = os.path.basename(path)
+    etag = '"%s"' % os.path.splitext(name)[0]                                   # the file name already holds the content hash
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = FileResponse(open(path, 'rb'), content_type='application/pdf', filename=name)
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)                  # revalidated, the bill details can still change
+    return response
+
+
+def sale_bill_pdf(request, billno):
+    return _bill_pdf(request, 'sale', billno)
+
+
+def purchase_bill_pdf(request, billno):
+    return _bill_pdf(request, 'purchase', billno)
+
+
+# csv/xlsx exports, streamed so a year of bills costs the same memory as a day;
+# ?background=1 hands the export to the job queue and answers with the job's status url instead
+def _export(request, form_class, rows, name):
+    form = form_class(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text())
+    if request.GET.get('background'):
+        job = enqueue('export', name, request.GET.dict())
+        return JsonResponse(_job_status(job), status=202)
+    filters = dict(form.cleaned_data)
+    fmt = filters.pop('format')
+    return export_response(rows(**filters), name, fmt)
+
+
+def export_sales(request):
+    return _export(request, ExportForm, sale_rows, 'sales')
+
+
+def export_purchases(request):
+    return _export(request, PurchaseExportForm, purchase_rows, 'purchases')
+
+
+def export_stock(request):
+    return _export(request, StockExportForm, stock_rows, 'inventory')
+
+
+def export_attendance(request):
+    return _export(request, AttendanceExportForm, attendance_rows, 'attendance')
+
+
+def _job_status(job):
+    result = job_result(job) if job.status == Job.DONE else None
+    status = {
+        'id'        : job.pk,
+        'task'      : job.task,
+        'status'    : job.status,
+        'attempts'  : job.attempts,
+        'created'   : job.created,
+        'finished'  : job.finished,
+        'url'       : reverse('job', args=[job.pk]),
+        'error'     : job.error.strip().splitlines()[-1] if job.error else None,           # the exception, not the traceback
+    }
+    if isinstance(result, dict) and 'file' in result:
+        status['download'] = reverse('job-file', args=[job.pk])
+    return status
+
+
+# the bill posting api of api.py, for the terminals and the web shop sync; they authenticate with
+# "Authorization: Bearer <POS_API_TOKEN>" rather than a session, so there is no csrf token to check
+def _api(request, endpoint):
+    token = settings.POS_API_TOKEN
+    if not token:
+        raise Http404
+    if not constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), 'Bearer ' + token):
+        response = JsonResponse({'error': 'Authorization: Bearer <token> is missing or wrong.'}, status=401)
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    try:
+        answer, replayed = submit(endpoint, request.body, request.META.get('HTTP_IDEMPOTENCY_KEY'))
+    except ApiError as error:
+        return JsonResponse(error.body, status=error.status)
+    response = JsonResponse(answer, status=201)
+    if replayed:
+        response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+@csrf_exempt
+@require_POST
+def api_sales(request):
+    return _api(request, 'sales')
+
+
+@csrf_exempt
+@require_POST
+def api_purchases(request):
+    return _api(request, 'purchases')
+
+
+# polled by the page that queued the job
+def job_status(request, pk):
+    response = JsonResponse(_job_status(get_object_or_404(Job, pk=pk)))
+    patch_cache_control(response, no_store=True)
+    return response
+
+
+# the file a finished job produced, e.g. a background export
+def job_file(request, pk):
+    job = get_object_or_404(Job, pk=pk, status=Job.DONE)
+    result = job_result(job)
+    if not isinstance(result, dict) or 'file' not in result or not os.path.exists(result['file']):
+        raise Http404("The job has no file, or it has been purged")
+    return FileResponse(open(result['file'], 'rb'), content_type=result['content_type'], as_attachment=True, filename=result['name'])
+
+
+# a profile photo thumbnail; its name changes with its content, so it can be cached for good
+def thumbnail(request, name):
+    if not THUMBNAIL_NAME.match(name):
+        raise Http404("No such thumbnail")
+    try:
+        f = default_storage.open('thumbs/' + name)
+    except FileNotFoundError:
+        raise Http404("No such thumbnail")
+    response = FileResponse(f, content_type='image/webp' if name.endswith('.webp') else 'image/jpeg')
+    patch_cache_control(response, public=True, max_age=365 * 86400, immutable=True)
+    return response
+
+
+# daily sales and purchases over a date range, read only from the rollup tables
+@async_view
+def sales_report(request):
+    form = ReportForm(request.GET)
+    if not form.is_valid():
+        return render(request, 'report.html', {'form': form}, status=400)
+    start, end = form.cleaned_data['start'], form.cleaned_data['end']
+    days = daily_totals(start, end)
+    context = {
+        'form'              : form,
+        'start'             : start,
+        'end'               : end,
+        'sale_amount'       : sum(day.sale_amount for day in days),
+        'sale_bills'        : sum(day.sale_bills for day in days),
+        'purchase_amount'   : sum(day.purchase_amount for day in days),
+        'purchase_bills'    : sum(day.purchase_bills for day in days),
+        'top_stocks'        : top_stocks(start, end, settings.POS_REPORT_TOP_STOCKS),
+        'suppliers'         : supplier_totals(start, end),
+        'chart'             : {
+            'labels'        : [day.date.isoformat() for day in days],
+            'sales'         : [day.sale_amount for day in days],
+            'purchases'     : [day.purchase_amount for day in days],
+        },
+    }
+    return render(request, 'report.html', context)
+
+
 #adding employees
 class EmployeeCreateView(SuccessMessageMixin, CreateView):
     model = Employee
@@ -470,11 +694,13 @@ class EmployeeCreateView(SuccessMessageMixin, CreateView):
 
 
 # shows a lists of all employees
-class EmployeeListView(ListView):
+@method_decorator(versioned('pos.employee'), name='get')
+class EmployeeListView(CursorPaginationMixin, ListView):
     model = Employee
     template_name = "employee_list.html"
     queryset = Employee.objects.filter(is_deleted=False)
     paginate_by = 10
+    cursor_ordering = ('id',)
 
 
 # used to update a employee's info
@@ -509,6 +735,7 @@ class EmployeeDeleteView(View):
         return redirect('employees-list')
 
 # used to view a supplier's profile
+@method_decorator(versioned('pos.employee'), name='get')
 class EmployeerView(View):
     def get(self, request, name):
         employeeobj = get_object_or_404(Employee, name=name)
@@ -532,20 +759,32 @@ class EmployeerView(View):
 #         context["savebtn"] = 'Add to Log'
 #         return context
 
+# the attendance sheet of one day: a row per live employee, saved as a whole with one statement
 def AttendenceMarkView(request):
-    if request.method == 'GET':
-        date = datetime.today()
-        employees = Employee.objects.all()
-        print (employees)
-
-        return render(request,'today_attendence.html',{'form':EmployeeAttendenceForm(),'date':date,'employees':employees})
-    else:
-        #getting inputs from user
-        form = EmployeeAttendenceForm(request.POST,request.FILES or None)
-        #validate user inputs and save to database
-        if form.is_valid():
-            newform = form.save(commit=False)
-            newform.save()
+    day_form = AttendanceDayForm(request.GET)
+    if not day_form.is_valid():
+        return HttpResponseBadRequest(day_form.errors.as_text())
+    day = day_form.cleaned_data['date']
+    employees = list(Employee.objects.filter(is_deleted=False).order_by('name', 'id').only('name', 'designation'))
+    if request.method == 'POST':
+        formset = EmployeeAttendenceFormset(request.POST)
+        if formset.is_valid():
+            mark_attendance(day, formset.statuses())
             messages.success(request, 'Attendence marked successfully')
-            return HttpResponseRedirect(reverse('#'))
-        return render(request,'today_attendence.html',{'form':EmployeeAttendenceForm()})
+            return redirect('%s?date=%s' % (reverse('today-attendence'), day.isoformat()))
+        names = {employee.pk: employee for employee in employees}
+        rows = [(names.get(form.cleaned_data.get('employee')), form) for form in formset.forms]
+    else:
+        marked = statuses_on(day)
+        formset = EmployeeAttendenceFormset(initial=[{'employee': employee.pk, 'status': marked.get(employee.pk, False)} for employee in employees])
+        rows = list(zip(employees, formset.forms))
+    return render(request, 'today_attendence.html', {'date': day, 'day_form': day_form, 'formset': formset, 'rows': rows})
+
+
+# days present and absent of every employee over one month
+def attendance_summary(request):
+    form = AttendanceMonthForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text())
+    month = form.cleaned_data['month']
+    return render(request, 'attendance_summary.html', {'form': form, 'month': month, 'summary': monthly_summary(month)})